@@ -0,0 +1,119 @@
+# coding=utf-8
+"""Measure MemberSearch query times over a large made-up group.
+
+Builds an index over --sections sections of --members members each,
+with names drawn from common first names and surnames, and reports
+the median and worst time of each query over --runs runs. Nothing is
+fetched from OSM.
+
+Exits non-zero if a median is over --max-ms, so it can guard against
+search regressions.
+
+Usage:
+  bench_search.py [--sections=<n>] [--members=<n>] [--runs=<n>]
+                  [--max-ms=<ms>] [<query>...]
+  bench_search.py (-h | --help)
+
+Options:
+  -h --help         Show this screen.
+  --sections=<n>    Sections in the group [default: 100].
+  --members=<n>     Members in each section [default: 300].
+  --runs=<n>        Times to run each query [default: 50].
+  --max-ms=<ms>     Fail if a median is over this many milliseconds.
+
+"""
+
+import os
+import sys
+import time
+import random
+
+from docopt import docopt
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'src', 'pyosm'))
+
+from search import MemberSearch
+
+FIRST_NAMES = """Olivia Amelia Isla Ava Mia Ivy Lily Isabella Rosie Sophia
+Grace Willow Freya Florence Emily Ella Poppy Evie Elsie Charlotte Evelyn
+Sienna Sofia Daisy Phoebe Sophie Alice Harper Matilda Ruby Emilia Maya
+Millie Isabelle Erin Arabella Eva Imogen Esme Maisie Noah Oliver George
+Arthur Muhammad Leo Harry Oscar Archie Henry Theodore Freddie Jack
+Charlie Theo Alfie Jacob Thomas Finley Arlo William Lucas Roman Tommy
+Isaac Teddy Alexander Luca Edward James Joshua Albie Elijah Max Mohammed
+Reuben Mason Sebastian Rory Jude Louie Benjamin Ethan Adam Hugo Joseph
+Reggie Ronnie Louis Frederick Albert Elliot Olly Hunter""".split()
+
+SURNAMES = """Smith Jones Taylor Brown Williams Wilson Johnson Davies
+Robinson Wright Thompson Evans Walker White Roberts Green Hall Wood
+Jackson Clarke Patel Khan Lewis James Phillips Mason Mitchell Rose Davis
+Rodriguez Cox Alexander Morgan Moore Mills King Harris Turner Hughes
+Ward Cooper Baker Hill Scott Martin Edwards Bell Kelly Allen Young""".split()
+
+QUERIES = ['olivia', 'jmes smith12', 'Wrigt', 'charlote', 'kid',
+           'alexander', 'xyzzy']
+
+
+class _Section(dict):
+    def __init__(self, sectionid, members):
+        dict.__init__(self, sectionid=sectionid)
+        self.members = members
+
+
+class _Group(object):
+    def __init__(self, sections, members):
+        rand = random.Random(0)
+        self.listeners = []
+        self.sections = {}
+        for s in range(sections):
+            sectionid = str(s + 1)
+            records = {}
+            for m in range(members):
+                scoutid = str(s * members + m + 1)
+                records[scoutid] = {
+                    'scoutid': scoutid,
+                    'firstname': rand.choice(FIRST_NAMES),
+                    'lastname': rand.choice(SURNAMES) +
+                                str(rand.randint(1, 40))}
+            self.sections[sectionid] = _Section(sectionid, records)
+
+
+def _median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+def main(argv=None):
+    args = docopt(__doc__, argv=argv)
+    runs = int(args['--runs'])
+    max_ms = float(args['--max-ms']) if args['--max-ms'] else None
+
+    group = _Group(int(args['--sections']), int(args['--members']))
+    start = time.time()
+    search = MemberSearch(group)
+    print "{0:<16} {1:8.1f} ms for {2} members".format(
+        'index', (time.time() - start) * 1000, len(search))
+
+    failed = False
+    for query in args['<query>'] or QUERIES:
+        times = []
+        for i in range(runs):
+            start = time.time()
+            results = search(query)
+            times.append((time.time() - start) * 1000)
+        median = _median(times)
+        print "{0:<16} {1:8.3f} ms (worst {2:.3f} ms, {3} results)".format(
+            query, median, max(times), len(results))
+        if max_ms is not None and median > max_ms:
+            print "  over the limit of {0} ms".format(max_ms)
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+# coding=utf-8
+"""Measure how long pyosm takes to start.
+
+Each measurement runs in a fresh interpreter, so nothing is already
+imported or cached. Reports the median time to import pyosm.osm and
+to run `osm.py --version`, and checks that the modules osm.py only
+loads on use (docopt, pprint, pickle and the HTTP stack) are not
+loaded by the import.
+
+Exits non-zero if a lazy module was imported, or if a median is over
+--max-ms, so it can guard against startup regressions.
+
+Usage:
+  bench_startup.py [--runs=<n>] [--max-ms=<ms>]
+  bench_startup.py (-h | --help)
+
+Options:
+  -h --help       Show this screen.
+  --runs=<n>      Interpreters to start for each measurement [default: 20].
+  --max-ms=<ms>   Fail if a median is over this many milliseconds.
+
+"""
+
+import os
+import sys
+import time
+import subprocess
+
+from docopt import docopt
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(ROOT, 'src')
+OSM_PY = os.path.join(SRC, 'pyosm', 'osm.py')
+
+LAZY_MODULES = ('docopt', 'pprint', 'pickle', 'urllib', 'urllib2',
+                'httplib', 'ssl')
+
+CHECK_LAZY = """
+import sys
+import pyosm.osm
+loaded = [m for m in {0!r} if m in sys.modules]
+if loaded:
+    sys.exit('Loaded on import: ' + ', '.join(loaded))
+""".format(LAZY_MODULES)
+
+
+def _env():
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [SRC, ROOT] + [p for p in [env.get('PYTHONPATH')] if p])
+    return env
+
+
+def _median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+def measure(argv, runs):
+    """Return the median milliseconds to run argv in a new interpreter."""
+    env = _env()
+    times = []
+    with open(os.devnull, 'w') as devnull:
+        for i in range(runs):
+            start = time.time()
+            subprocess.check_call(argv, env=env, stdout=devnull)
+            times.append((time.time() - start) * 1000)
+    return _median(times)
+
+
+def main(argv=None):
+    args = docopt(__doc__, argv=argv)
+    runs = int(args['--runs'])
+    max_ms = float(args['--max-ms']) if args['--max-ms'] else None
+
+    failed = False
+    if subprocess.call([sys.executable, '-c', CHECK_LAZY], env=_env()):
+        failed = True
+
+    baseline = measure([sys.executable, '-c', 'pass'], runs)
+    print "{0:<24} {1:8.1f} ms".format('python -c pass', baseline)
+
+    for name, command in [('import pyosm.osm',
+                           [sys.executable, '-c', 'import pyosm.osm']),
+                          ('osm.py --version',
+                           [sys.executable, OSM_PY, '--version'])]:
+        median = measure(command, runs)
+        print "{0:<24} {1:8.1f} ms ({2:+.1f} ms)".format(
+            name, median, median - baseline)
+        if max_ms is not None and median > max_ms:
+            print "  over the limit of {0} ms".format(max_ms)
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
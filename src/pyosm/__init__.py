@@ -1,4 +1,5 @@
-# Example package with a console entry point
+# Console entry point: the osm.py command line.
 
 def main():
-    print "Hello World"
+    from pyosm import osm
+    osm.main()
@@ -0,0 +1,193 @@
+# coding=utf-8
+"""Badge completion across every section of an OSM.
+
+BadgeProgress fetches the members' progress on every badge of every
+section concurrently and keeps it as a progress matrix per badge:
+activities are the columns, (sectionid, scoutid) the rows, and each
+column is stored as one integer whose bits are the rows that have
+done that activity. Counting completions is then an AND of the
+columns and a popcount rather than a walk over nested dicts.
+
+    progress = BadgeProgress(osm)
+    for section, badge_type, name, members, completed, percent \
+            in progress.summary():
+        print section, name, completed, percent
+
+    for sectionid, scoutid, missing in progress.near_completion(
+            ('cubs', 'challenge', 'Camper'), remaining=1):
+        ...
+
+A badge is identified by (section type, badge type, badge name), as
+beaver, cub and scout badges of the same name have different
+activities. Sections of the same type share a matrix, their activity
+columns matched by the activity name from the badge structure, so a
+badge whose fields are numbered differently in two sections still
+lines up.
+"""
+
+import logging
+
+import osm
+
+log = logging.getLogger(__name__)
+
+
+def is_done(value):
+    """Whether an activity value records the activity as done.
+
+    OSM leaves undone activities empty and marks ones that were
+    started but not passed with a leading 'x'.
+    """
+    if value is None:
+        return False
+    value = unicode(value).strip()
+    return bool(value) and not value.lower().startswith('x')
+
+
+class _Matrix(object):
+    """Progress on one badge: a bitset column per activity."""
+
+    def __init__(self):
+        self.activities = []
+        self._columns = {}
+        self.columns = []
+        self.rows = []
+        self._row_index = {}
+
+    def column(self, name):
+        try:
+            return self._columns[name]
+        except KeyError:
+            self._columns[name] = len(self.activities)
+            self.activities.append(name)
+            self.columns.append(0)
+            return self._columns[name]
+
+    def add(self, row, fields, record):
+        i = self._row_index.get(row)
+        if i is None:
+            i = self._row_index[row] = len(self.rows)
+            self.rows.append(row)
+
+        for field, name in fields:
+            if is_done(record.get(field)):
+                self.columns[self.column(name)] |= 1 << i
+            else:
+                self.column(name)
+
+    def all_rows(self):
+        return (1 << len(self.rows)) - 1
+
+    def completed(self):
+        bits = self.all_rows()
+        for column in self.columns:
+            bits &= column
+        return bits if self.columns else 0
+
+    def missing(self, i):
+        return [name for name, column in zip(self.activities, self.columns)
+                if not (column >> i) & 1]
+
+
+class BadgeProgress(object):
+    """Group-wide progress on badges, fetched from every section.
+
+    badge_types limits the badge types fetched. Badges whose members
+    could not be fetched are recorded in errors, keyed by
+    (sectionid, badge_type, badge name), and left out.
+    """
+
+    def __init__(self, group, badge_types=osm.Section.BADGE_TYPES,
+                 workers=8):
+        self.errors = {}
+        self._matrices = {}
+
+        items = []
+        for section in group.sections.values():
+            for badge_type in badge_types:
+                for badge in getattr(section, badge_type).values():
+                    items.append((section, badge_type, badge))
+
+        results = osm._fetch_concurrently(
+            lambda item: item[2].get_members(), items, workers)
+
+        for (section, badge_type, badge), records, error in results:
+            if error is not None:
+                log.warning("Fetching {0} progress in {1} failed: {2}".format(
+                    badge.name, section['sectionid'], error))
+                self.errors[(section['sectionid'], badge_type,
+                             badge.name)] = error
+                continue
+
+            matrix = self._matrices.setdefault(
+                (section['section'], badge_type, badge.name), _Matrix())
+            fields = badge.activity_fields()
+            for name in [name for field, name in fields]:
+                matrix.column(name)
+            for record in records:
+                matrix.add((section['sectionid'], record['scoutid']),
+                           fields, record)
+
+    def badges(self):
+        """Return the (section type, badge type, name) of each badge, sorted."""
+        return sorted(self._matrices.keys())
+
+    def activities(self, badge):
+        return list(self._matrices[badge].activities)
+
+    def members(self, badge):
+        """Number of members with a progress record for badge."""
+        return len(self._matrices[badge].rows)
+
+    def completed(self, badge):
+        """Number of members who have done every activity of badge."""
+        return osm._popcount(self._matrices[badge].completed())
+
+    def completed_by(self, badge):
+        """Return the (sectionid, scoutid) of each member who completed badge."""
+        matrix = self._matrices[badge]
+        bits = matrix.completed()
+        return [row for i, row in enumerate(matrix.rows) if (bits >> i) & 1]
+
+    def percentage(self, badge):
+        """Percentage of the members with a record who completed badge."""
+        members = self.members(badge)
+        if not members:
+            return None
+        return 100.0 * self.completed(badge) / members
+
+    def activity_counts(self, badge):
+        """Return a list of (activity, members who have done it)."""
+        matrix = self._matrices[badge]
+        return [(name, osm._popcount(column))
+                for name, column in zip(matrix.activities, matrix.columns)]
+
+    def near_completion(self, badge, remaining=1):
+        """Return the members with 1 to remaining activities of badge left.
+
+        Each entry is (sectionid, scoutid, missing activity names),
+        fewest missing first.
+        """
+        matrix = self._matrices[badge]
+        total = len(matrix.activities)
+
+        done = [0] * len(matrix.rows)
+        for column in matrix.columns:
+            i = 0
+            while column:
+                if column & 1:
+                    done[i] += 1
+                column >>= 1
+                i += 1
+
+        ret = [(matrix.rows[i][0], matrix.rows[i][1], matrix.missing(i))
+               for i, count in enumerate(done)
+               if 0 < total - count <= remaining]
+        return sorted(ret, key=lambda entry: len(entry[2]))
+
+    def summary(self):
+        """Return a tuple per badge of its section type, badge type,
+        name, members, completed and percentage."""
+        return [badge + (self.members(badge), self.completed(badge),
+                         self.percentage(badge))
+                for badge in self.badges()]
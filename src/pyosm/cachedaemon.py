@@ -0,0 +1,256 @@
+# coding=utf-8
+"""Local cache daemon shared by several pyosm processes.
+
+Usage:
+  cachedaemon.py [--ttl=<seconds>] [--size=<entries>] <socket>
+  cachedaemon.py (-h | --help)
+
+Options:
+  -h --help          Show this screen.
+  --ttl=<seconds>    Seconds an entry is kept [default: 3600].
+  --size=<entries>   Most entries kept; the least recently used go
+                     first [default: 10000].
+
+The daemon listens on a Unix domain socket and holds cache entries in
+a TTL/LRU store. Clients lease a key before fetching it, so when
+several processes miss on the same key only one of them goes to OSM
+and the rest wait for its result (single-flight). Invalidation
+happens under the store lock, so no client sees part of it.
+
+Accessor.use_daemon(path) makes Accessor use the daemon; if the daemon
+cannot be reached, Accessor falls back to its in-process cache.
+
+Messages in both directions are a 4 byte length followed by a pickle.
+The socket is created readable and writable by its owner only.
+"""
+
+import os
+import re
+import sys
+import time
+import errno
+import pickle
+import socket
+import struct
+import logging
+import threading
+import collections
+import SocketServer
+
+log = logging.getLogger(__name__)
+
+LENGTH = struct.Struct('!I')
+
+
+def _send(sock, message):
+    data = pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+    sock.sendall(LENGTH.pack(len(data)) + data)
+
+
+def _recv_exactly(sock, n):
+    chunks = []
+    while n:
+        chunk = sock.recv(n)
+        if not chunk:
+            raise EOFError
+        chunks.append(chunk)
+        n -= len(chunk)
+    return ''.join(chunks)
+
+
+def _recv(sock):
+    n = LENGTH.unpack(_recv_exactly(sock, LENGTH.size))[0]
+    return pickle.loads(_recv_exactly(sock, n))
+
+
+class Store(object):
+    """A TTL/LRU store of cache entries with single-flight leases."""
+
+    def __init__(self, ttl=3600, size=10000, lease_timeout=60):
+        self.ttl = ttl
+        self.size = size
+        self.lease_timeout = lease_timeout
+
+        self._entries = collections.OrderedDict()
+        self._leases = {}
+        self._cond = threading.Condition()
+        self.stats = collections.Counter()
+
+    def _get(self, key):
+        try:
+            expires, canonical, entry = self._entries.pop(key)
+        except KeyError:
+            return None
+        if expires < time.time():
+            self.stats['expired'] += 1
+            return None
+        # Re-insert to mark it most recently used.
+        self._entries[key] = (expires, canonical, entry)
+        return entry
+
+    def get(self, key):
+        with self._cond:
+            entry = self._get(key)
+            self.stats['hit' if entry is not None else 'miss'] += 1
+            return entry
+
+    def lease(self, key):
+        """Return ('hit', entry), or ('lease', None) to fetch key.
+
+        While another client holds the lease on key this waits for it
+        to set the entry, release the lease or time out.
+        """
+        with self._cond:
+            while True:
+                entry = self._get(key)
+                if entry is not None:
+                    self.stats['hit'] += 1
+                    return 'hit', entry
+
+                expires = self._leases.get(key)
+                if expires is None or expires < time.time():
+                    self._leases[key] = time.time() + self.lease_timeout
+                    self.stats['miss'] += 1
+                    return 'lease', None
+
+                self.stats['wait'] += 1
+                self._cond.wait(expires - time.time())
+
+    def set(self, key, canonical, entry):
+        with self._cond:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.time() + self.ttl, canonical, entry)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+                self.stats['evicted'] += 1
+            self._leases.pop(key, None)
+            self._cond.notify_all()
+
+    def release(self, key):
+        with self._cond:
+            self._leases.pop(key, None)
+            self._cond.notify_all()
+
+    def invalidate(self, match=None, pattern=None):
+        """Drop every entry, or those whose request contains match or
+        matches the regular expression pattern.
+
+        Entries stored without their request are dropped by either.
+        """
+        regex = re.compile(pattern) if pattern is not None else None
+        with self._cond:
+            if match is None and regex is None:
+                count = len(self._entries)
+                self._entries.clear()
+            else:
+                keys = [key for key, (expires, canonical, entry)
+                        in self._entries.items()
+                        if canonical is None or
+                        (match is not None and match in canonical) or
+                        (regex is not None and regex.search(canonical))]
+                for key in keys:
+                    del self._entries[key]
+                count = len(keys)
+            self.stats['invalidated'] += count
+            return count
+
+
+class _Handler(SocketServer.BaseRequestHandler):
+    def handle(self):
+        store = self.server.store
+        while True:
+            try:
+                message = _recv(self.request)
+            except EOFError:
+                return
+
+            op, args = message[0], message[1:]
+            try:
+                if op == 'stats':
+                    result = dict(store.stats, entries=len(store._entries))
+                else:
+                    result = getattr(store, op)(*args)
+                _send(self.request, ('ok', result))
+            except Exception as e:
+                log.exception("Cache daemon request {0} failed".format(op))
+                _send(self.request, ('error', str(e)))
+
+
+class CacheDaemon(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, store=None):
+        if os.path.exists(path):
+            os.unlink(path)
+        self.store = store or Store()
+
+        umask = os.umask(0177)
+        try:
+            SocketServer.UnixStreamServer.__init__(self, path, _Handler)
+        finally:
+            os.umask(umask)
+
+
+class CacheClient(object):
+    """A connection to a CacheDaemon; one socket per thread."""
+
+    OPS = ('get', 'lease', 'set', 'release', 'invalidate', 'stats')
+
+    def __init__(self, path, timeout=120):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _socket(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.path)
+            self._local.sock = sock
+        return sock
+
+    def call(self, op, *args):
+        """Send a request; raises socket.error if the daemon is down."""
+        try:
+            sock = self._socket()
+            _send(sock, (op,) + args)
+            status, result = _recv(sock)
+        except (socket.error, EOFError) as e:
+            self.close()
+            raise socket.error(errno.ECONNREFUSED,
+                               "Cache daemon unavailable: {0}".format(e))
+        if status != 'ok':
+            raise RuntimeError(result)
+        return result
+
+    def __getattr__(self, op):
+        if op not in self.OPS:
+            raise AttributeError(op)
+        return lambda *args: self.call(op, *args)
+
+    def close(self):
+        sock = getattr(self._local, 'sock', None)
+        self._local.sock = None
+        if sock is not None:
+            sock.close()
+
+
+def main(argv=None):
+    from docopt import docopt
+
+    args = docopt(__doc__, argv=argv)
+    logging.basicConfig(level=logging.INFO)
+
+    server = CacheDaemon(args['<socket>'],
+                         Store(ttl=float(args['--ttl']),
+                               size=int(args['--size'])))
+    log.info("Cache daemon listening on {0}".format(args['<socket>']))
+    try:
+        server.serve_forever()
+    finally:
+        os.unlink(args['<socket>'])
+
+
+if __name__ == '__main__':
+    main()
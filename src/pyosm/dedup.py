@@ -0,0 +1,178 @@
+# coding=utf-8
+"""Find members who appear more than once across sections.
+
+Rather than comparing every member with every other, each member is
+given a few blocking keys:
+
+  name      normalised first and last name with date of birth
+  dob_last  date of birth with the start of the last name
+  phone     hash of the digits of each phone number
+  email     hash of each email address
+
+Only members that share a key are compared, so the work grows with
+the number of members rather than its square. Each candidate pair is
+scored and pairs above a threshold are joined into clusters for
+review.
+
+    for cluster in find_duplicates(osm):
+        print [member['scoutid'] for sectionid, member in cluster.members]
+"""
+
+import re
+import hashlib
+import logging
+import itertools
+import collections
+
+from search import normalise, trigrams
+
+log = logging.getLogger(__name__)
+
+PHONE_FIELDS = ('phone1', 'phone2', 'phone3', 'phone4')
+EMAIL_FIELDS = ('email1', 'email2', 'email3', 'email4')
+
+Match = collections.namedtuple('Match', 'a b score reasons')
+Cluster = collections.namedtuple('Cluster', 'members matches')
+
+
+def _get(member, key):
+    try:
+        return member[key] or ''
+    except KeyError:
+        return ''
+
+
+def _hash(value):
+    return hashlib.sha1(value.encode('utf-8')).hexdigest()
+
+
+def _name(member):
+    return re.sub(r'[^a-z]', '', normalise(_get(member, 'firstname'))), \
+        re.sub(r'[^a-z]', '', normalise(_get(member, 'lastname')))
+
+
+def _phones(member):
+    ret = set()
+    for field in PHONE_FIELDS:
+        digits = re.sub(r'\D', '', unicode(_get(member, field)))
+        if len(digits) >= 7:
+            ret.add(_hash(digits[-10:]))
+    return ret
+
+
+def _emails(member):
+    ret = set()
+    for field in EMAIL_FIELDS:
+        email = normalise(_get(member, field)).strip()
+        if '@' in email:
+            ret.add(_hash(email))
+    return ret
+
+
+class _Record(object):
+    __slots__ = ('doc', 'member', 'first', 'last', 'dob', 'grams',
+                 'phones', 'emails')
+
+    def __init__(self, doc, member):
+        self.doc = doc
+        self.member = member
+        self.first, self.last = _name(member)
+        self.dob = unicode(_get(member, 'dob')).strip()
+        self.grams = trigrams(self.first + ' ' + self.last)
+        self.phones = _phones(member)
+        self.emails = _emails(member)
+
+    def keys(self):
+        if self.first and self.last and self.dob:
+            yield ('name', self.first, self.last, self.dob)
+        if self.last and self.dob:
+            yield ('dob_last', self.dob, self.last[:3])
+        for phone in self.phones:
+            yield ('phone', phone)
+        for email in self.emails:
+            yield ('email', email)
+
+
+def score(a, b):
+    """Return (score, reasons) for how likely a and b are one person.
+
+    The name similarity (Dice of the name trigrams) counts for half the
+    score, and a matching date of birth, phone and email for the rest.
+    """
+    reasons = []
+
+    common = len(a.grams & b.grams)
+    name = 2.0 * common / (len(a.grams) + len(b.grams) or 1)
+    if name > 0.5:
+        reasons.append('name')
+    total = 0.5 * name
+
+    if a.dob and a.dob == b.dob:
+        total += 0.3
+        reasons.append('dob')
+    if a.phones & b.phones:
+        total += 0.1
+        reasons.append('phone')
+    if a.emails & b.emails:
+        total += 0.1
+        reasons.append('email')
+
+    return total, reasons
+
+
+def find_duplicates(osm, threshold=0.6, max_block=50):
+    """Return the clusters of likely duplicate members across sections.
+
+    Each Cluster holds its (sectionid, member) pairs and the Matches
+    that joined them. Blocks larger than max_block (a phone number
+    shared by a whole family, say) are too broad to be useful and are
+    skipped.
+    """
+    records = []
+    for section in osm.sections.values():
+        for member in section.members.values():
+            records.append(_Record((section['sectionid'], member['scoutid']),
+                                   member))
+
+    blocks = collections.defaultdict(list)
+    for i, record in enumerate(records):
+        for key in record.keys():
+            blocks[key].append(i)
+
+    parent = range(len(records))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    compared = set()
+    matches = []
+    for key, block in blocks.iteritems():
+        if len(block) > max_block:
+            log.debug("Skipping block {0} of {1} members".format(
+                key[0], len(block)))
+            continue
+        for i, j in itertools.combinations(block, 2):
+            if (i, j) in compared:
+                continue
+            compared.add((i, j))
+
+            total, reasons = score(records[i], records[j])
+            if total >= threshold:
+                matches.append((i, Match(records[i].doc, records[j].doc,
+                                         total, reasons)))
+                parent[find(i)] = find(j)
+
+    clusters = dict([(find(i), Cluster([], [])) for i, match in matches])
+    for i, record in enumerate(records):
+        cluster = clusters.get(find(i))
+        if cluster is not None:
+            cluster.members.append((record.doc[0], record.member))
+    for i, match in matches:
+        clusters[find(i)].matches.append(match)
+
+    return sorted(clusters.values(),
+                  key=lambda cluster: -max([m.score
+                                            for m in cluster.matches]))
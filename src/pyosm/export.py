@@ -0,0 +1,218 @@
+# coding=utf-8
+"""Streaming export of members and badge progress.
+
+member_rows() and badge_rows() generate one flat row at a time from
+any number of sections, and the writers consume them as they are
+produced, so an export only ever holds one section's data and one
+row (or one Parquet batch) at a time. member_rows() looks over the
+columns of every section first, so that all its rows share one header.
+
+    with open('members.csv', 'wb') as out:
+        write_csv(member_rows(osm.sections.values()), out)
+
+    with open('badges.jsonl', 'wb') as out:
+        write_jsonl(badge_rows(osm.sections.values()), out)
+"""
+
+import csv
+import json
+import logging
+import itertools
+import collections
+
+import osm
+
+log = logging.getLogger(__name__)
+
+# Columns that lead every member row, ahead of the rest in name order.
+MEMBER_COLUMNS = ('sectionid', 'scoutid', 'firstname', 'lastname')
+
+BADGE_COLUMNS = ('sectionid', 'badge_type', 'badge', 'scoutid',
+                 'firstname', 'lastname', 'activity', 'value')
+
+
+def member_columns(sections, friendly=True):
+    """Return the columns of member_rows(): every column of any member.
+
+    The columns in MEMBER_COLUMNS come first, then the rest in name
+    order. With friendly set, custom columns are named from each
+    section's column map.
+    """
+    names = set()
+    for section in sections:
+        members = section.members
+        column_map = members._column_map if friendly else {}
+        for member in members.values():
+            names.update([column_map.get(name, name)
+                          for name in member._record.keys()])
+    names.add('sectionid')
+
+    return [name for name in MEMBER_COLUMNS if name in names] + \
+        sorted([name for name in names if name not in MEMBER_COLUMNS])
+
+
+def member_rows(sections, friendly=True):
+    """Generate a row for every member of sections.
+
+    Every row has the same member_columns(), so sections with
+    different custom columns can be written to one file; columns a
+    section lacks are left empty. With friendly set, custom columns
+    are named from the section's column map rather than by their raw
+    names.
+    """
+    sections = list(sections)
+    columns = member_columns(sections, friendly)
+
+    for section in sections:
+        members = section.members
+        column_map = members._column_map if friendly else {}
+
+        for member in members.values():
+            row = collections.OrderedDict([(column, '')
+                                           for column in columns])
+            for name, value in member._record.iteritems():
+                row[column_map.get(name, name)] = value
+            row['sectionid'] = section['sectionid']
+            yield row
+
+
+def badge_rows(sections, badge_types=osm.Section.BADGE_TYPES):
+    """Generate a row for every member's progress on every activity.
+
+    Rows are in long form, one per (member, badge, activity), so that
+    badges with different activities share the same columns.
+    """
+    for section in sections:
+        for badge_type in badge_types:
+            for badge in getattr(section, badge_type).values():
+                fields = badge.activity_fields()
+                for record in badge.get_members():
+                    for field, name in fields:
+                        yield collections.OrderedDict([
+                            ('sectionid', section['sectionid']),
+                            ('badge_type', badge_type),
+                            ('badge', badge.name),
+                            ('scoutid', record['scoutid']),
+                            ('firstname', record.get('firstname', '')),
+                            ('lastname', record.get('lastname', '')),
+                            ('activity', name),
+                            ('value', record.get(field, ''))])
+
+
+def _columns(rows, columns):
+    """Return (columns, rows), taking the columns from the first row.
+
+    The rows returned warn, once, if a row has a column not among
+    columns, as a file with fixed columns has nowhere to put it.
+    """
+    rows = iter(rows)
+    if columns is not None:
+        columns = list(columns)
+    else:
+        try:
+            first = next(rows)
+        except StopIteration:
+            return [], rows
+        columns = list(first.keys())
+        rows = itertools.chain([first], rows)
+    return columns, _checked(rows, columns)
+
+
+def _checked(rows, columns):
+    known = set(columns)
+    warned = False
+    for row in rows:
+        if not warned and len(row) > len(known):
+            extra = [column for column in row if column not in known]
+            if extra:
+                log.warning("Dropping columns not in the header: "
+                            "{0}".format(', '.join(sorted(extra))))
+                warned = True
+        yield row
+
+
+def _encode(value):
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return value
+
+
+def write_csv(rows, out, columns=None):
+    """Write rows to out as CSV.
+
+    The columns default to those of the first row; missing values are
+    left empty, and columns not in the header are dropped with a
+    warning.
+    Returns the number of rows written.
+    """
+    columns, rows = _columns(rows, columns)
+
+    writer = csv.writer(out)
+    writer.writerow([_encode(column) for column in columns])
+
+    count = 0
+    for row in rows:
+        writer.writerow([_encode(row.get(column, '')) for column in columns])
+        count += 1
+    return count
+
+
+def write_jsonl(rows, out):
+    """Write rows to out as JSON Lines. Returns the number written."""
+    count = 0
+    for row in rows:
+        out.write(json.dumps(row))
+        out.write('\n')
+        count += 1
+    return count
+
+
+def write_parquet(rows, path, columns=None, batch_size=1000):
+    """Write rows to a Parquet file at path, batch_size rows at a time.
+
+    All values are written as strings. Requires pyarrow.
+    """
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet export needs pyarrow installed")
+
+    columns, rows = _columns(rows, columns)
+    schema = pyarrow.schema([(column, pyarrow.string())
+                             for column in columns])
+
+    count = 0
+    writer = pyarrow.parquet.ParquetWriter(path, schema)
+    try:
+        while True:
+            batch = list(itertools.islice(rows, batch_size))
+            if not batch:
+                break
+            arrays = [pyarrow.array([unicode(row.get(column, ''))
+                                     for row in batch],
+                                    type=pyarrow.string())
+                      for column in columns]
+            writer.write_table(pyarrow.Table.from_arrays(arrays,
+                                                         schema=schema))
+            count += len(batch)
+    finally:
+        writer.close()
+    return count
+
+
+WRITERS = {'csv': write_csv,
+           'jsonl': write_jsonl,
+           'parquet': write_parquet}
+
+
+def export(rows, dest, format='csv'):
+    """Write rows to dest in format ('csv', 'jsonl' or 'parquet').
+
+    dest is a path for Parquet and a file object otherwise.
+    """
+    try:
+        writer = WRITERS[format]
+    except KeyError:
+        raise ValueError("Unknown export format {0!r}".format(format))
+    return writer(rows, dest)
@@ -2,8 +2,8 @@
 """Online Scout Manager Interface.
 
 Usage:
-  osm.py <apiid> <token>
-  osm.py <apiid> <token> run <query>
+  osm.py [--memory] [--profile=<file>] [--compress=<codec>] <apiid> <token>
+  osm.py [--profile=<file>] [--compress=<codec>] <apiid> <token> run <query>
   osm.py <apiid> <token> -a <email> <password>
   osm.py (-h | --help)
   osm.py --version
@@ -13,28 +13,47 @@ Options:
   -h --help      Show this screen.
   --version      Show version.
   -a             Request authorisation credentials.
+  --memory       Report the memory used by each section and cache entry.
+  --profile=<file>  Record the time spent in each request and build step
+                 to <file>: a Chrome trace if it ends in .json, otherwise
+                 collapsed stacks for flamegraph.pl.
+  --compress=<codec>  Keep new responses in the cache compressed with
+                 zlib, bz2 or lzma (if installed).
 
 """
 
-from docopt import docopt
-
+import os
 import sys
-import urllib
-import urllib2
+import socket
+import urlparse
+import hashlib
 import json
-import pickle
 import logging
 import datetime
-import pprint
 import collections
+import bisect
+import threading
+import Queue
+import re
+import atexit
+import time
+import types
+import functools
+import heapq
+import random
 
 log = logging.getLogger(__name__)
-pp = pprint.PrettyPrinter(indent=4)
 
 DEF_CACHE = "osm.cache"
 DEF_CREDS = "osm.creds"
 
 
+def _pformat(obj):
+    # pprint is only wanted for debug output, so it is imported on use.
+    import pprint
+    return pprint.PrettyPrinter(indent=4).pformat(obj)
+
+
 class OSMException(Exception):
     def __init__(self, url, values, error):
         self._url = url
@@ -49,6 +68,242 @@ class OSMException(Exception):
                                      self._error)
 
 
+class TermError(Exception):
+    pass
+
+
+# The fixed date formats OSM returns: 'generic' dates and the
+# dates of requests made with dateFormat=uk.
+GENERIC_DATE = '%Y-%m-%d'
+UK_DATE = '%d/%m/%Y'
+
+_date_cache = {}
+_DATE_CACHE_SIZE = 100000
+
+
+def parse_date(value, fmt=GENERIC_DATE):
+    """Parse an OSM date string, returning None for an empty value.
+
+    Results are memoised, and the two fixed OSM formats are parsed by
+    slicing rather than with strptime. Raises ValueError for a value
+    that is not a valid date.
+    """
+    if not value:
+        return None
+
+    key = (value, fmt)
+    try:
+        return _date_cache[key]
+    except KeyError:
+        pass
+
+    if fmt == GENERIC_DATE and len(value) == 10 and \
+            value[4] == '-' and value[7] == '-':
+        date = datetime.datetime(int(value[0:4]), int(value[5:7]),
+                                 int(value[8:10]))
+    elif fmt == UK_DATE and len(value) == 10 and \
+            value[2] == '/' and value[5] == '/':
+        date = datetime.datetime(int(value[6:10]), int(value[3:5]),
+                                 int(value[0:2]))
+    else:
+        date = datetime.datetime.strptime(value, fmt)
+
+    if len(_date_cache) >= _DATE_CACHE_SIZE:
+        _date_cache.clear()
+    _date_cache[key] = date
+    return date
+
+
+def parse_dates(values, fmt=GENERIC_DATE):
+    """Parse a column of date strings in bulk.
+
+    Each distinct value is parsed once. Values that are not valid
+    dates become None. Returns a list in the order of values.
+    """
+    values = list(values)
+    parsed = {}
+    for value in set(values):
+        try:
+            parsed[value] = parse_date(value, fmt)
+        except (ValueError, TypeError):
+            log.debug("Invalid date {0!r}".format(value))
+            parsed[value] = None
+    return [parsed[value] for value in values]
+
+
+def age_at(dob, date):
+    """Return the (years, months) age on date of someone born on dob."""
+    months = (date.year - dob.year) * 12 + date.month - dob.month
+    if date.day < dob.day:
+        months -= 1
+    return divmod(months, 12)
+
+
+class Profiler(object):
+    """Record wall-time spans of the phases of an OSM run.
+
+    Spans nest per thread. write() saves them as a Chrome trace (for
+    chrome://tracing or Perfetto) when the path ends in .json, or
+    otherwise as collapsed stacks for flamegraph.pl, weighted by the
+    microseconds spent in each stack itself.
+    """
+
+    def __init__(self):
+        self.spans = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def span(self, name):
+        return _Span(self, name)
+
+    def _stack(self):
+        try:
+            return self._local.stack
+        except AttributeError:
+            self._local.stack = []
+            return self._local.stack
+
+    def _record(self, stack, start, end):
+        with self._lock:
+            self.spans.append((tuple(stack), start, end,
+                               threading.current_thread().ident))
+
+    def chrome_trace(self):
+        events = []
+        for stack, start, end, tid in self.spans:
+            events.append({'name': stack[-1],
+                           'ph': 'X',
+                           'ts': _microseconds(start),
+                           'dur': _microseconds(end - start),
+                           'pid': os.getpid(),
+                           'tid': tid})
+        return {'traceEvents': events}
+
+    def collapsed(self):
+        """Return a dict of 'a;b;c' stack -> microseconds in that stack."""
+        totals = collections.Counter()
+        children = collections.Counter()
+        for stack, start, end, tid in self.spans:
+            duration = _microseconds(end - start)
+            totals[(tid, stack)] += duration
+            if len(stack) > 1:
+                children[(tid, stack[:-1])] += duration
+
+        ret = collections.Counter()
+        for (tid, stack), duration in totals.items():
+            ret[';'.join(stack)] += max(0, duration - children[(tid, stack)])
+        return dict(ret)
+
+    def write(self, path):
+        with open(path, 'w') as out:
+            if path.endswith('.json'):
+                json.dump(self.chrome_trace(), out)
+            else:
+                for stack, duration in sorted(self.collapsed().items()):
+                    out.write("{0} {1}\n".format(stack, duration))
+
+
+def _microseconds(seconds):
+    # Rounded, as truncating 10.5 - 10.2 seconds gives 299999.
+    return int(round(seconds * 1e6))
+
+
+class _Span(object):
+    def __init__(self, profiler, name):
+        self._profiler = profiler
+        self._name = name
+
+    def __enter__(self):
+        self._stack = self._profiler._stack()
+        self._stack.append(self._name)
+        self._start = time.time()
+        return self
+
+    def __exit__(self, *exc):
+        self._profiler._record(self._stack, self._start, time.time())
+        self._stack.pop()
+
+
+class _NoSpan(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+# The Profiler in use, if any; see set_profiler().
+_profiler = None
+
+
+def set_profiler(profiler):
+    """Record spans to profiler from now on (None to stop)."""
+    global _profiler
+    _profiler = profiler
+
+
+def _span(name):
+    if _profiler is None:
+        return _NoSpan()
+    return _profiler.span(name)
+
+
+def _profiled(name):
+    """Decorate a function so that each call is recorded as a span."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def _as_datetime(date):
+    if date is None or isinstance(date, datetime.datetime):
+        return date
+    return datetime.datetime.combine(date, datetime.time())
+
+
+def _popcount(bits):
+    return bin(bits).count('1')
+
+
+def _fetch_concurrently(func, items, workers=4):
+    """Call func on each item from a pool of threads.
+
+    Returns a list of (item, result, error) tuples in the order of
+    items. error is None when the call succeeded.
+    """
+    items = list(items)
+    results = [None] * len(items)
+    work = Queue.Queue()
+    for i, item in enumerate(items):
+        work.put((i, item))
+
+    def worker():
+        while True:
+            try:
+                i, item = work.get_nowait()
+            except Queue.Empty:
+                return
+            try:
+                results[i] = (item, func(item), None)
+            except Exception as e:
+                log.debug("Concurrent fetch failed: {0}".format(e))
+                results[i] = (item, None, e)
+
+    threads = [threading.Thread(target=worker)
+               for i in range(min(workers, len(items)))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return results
+
+
 class OSMObject(collections.MutableMapping):
     def __init__(self, osm, accessor, record):
         self._osm = osm
@@ -89,52 +344,385 @@ class OSMObject(collections.MutableMapping):
         return self._record.__iter__()
 
 
+class CompressedResponse(object):
+    """A response body kept compressed in the Accessor cache.
+
+    codec names a module with compress() and decompress() functions:
+    'zlib', 'bz2', or 'lzma' where that is installed.
+    """
+
+    CODECS = ('zlib', 'bz2', 'lzma')
+
+    def __init__(self, codec, raw):
+        self.codec = codec
+        self.size = len(raw)
+        self.data = self._module(codec).compress(raw)
+
+    @classmethod
+    def _module(cls, codec):
+        if codec not in cls.CODECS:
+            raise ValueError("Unknown compression {0!r}".format(codec))
+        return __import__(codec)
+
+    def decode(self):
+        return json.loads(self._module(self.codec).decompress(self.data))
+
+
+class Throttle(object):
+    """Space requests out so that no more than rate are made a second."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def _reserve(self, now):
+        with self._lock:
+            slot = max(now, self._next)
+            self._next = slot + 1.0 / self.rate
+        return slot
+
+    def wait(self):
+        now = time.time()
+        delay = self._reserve(now) - now
+        if delay > 0:
+            time.sleep(delay)
+
+
 class Accessor(object):
+    # Writers set or remove single keys of the cache dicts under
+    # __cache_lock__; a single-key change is atomic, so readers look
+    # keys up without locking. Anything that walks a whole dict takes
+    # a copy under the lock first (see __cache_snapshot__).
     __cache__ = {}
+    __cache_keys__ = {}
+    __cache_lock__ = threading.RLock()
+
+    __inflight__ = {}
+    __inflight_lock__ = threading.Lock()
 
     BASE_URL = "https://www.onlinescoutmanager.co.uk/"
 
+    # A Throttle shared by every Accessor, or None for no rate limit.
+    throttle = None
+
+    # Seconds a cached response stays fresh; None keeps it for ever.
+    FRESH_TTL = None
+
+    # Once a response is no longer fresh, keep serving it while it is
+    # refreshed in the background, until it is older than MAX_STALE
+    # seconds (None for no limit). Past that a request blocks.
+    STALE_WHILE_REVALIDATE = False
+    MAX_STALE = None
+
+    # Counts of cache events, e.g. 'stale_served'.
+    metrics = collections.Counter()
+
+    # A cachedaemon.CacheClient shared by every Accessor, or None; see
+    # use_daemon(). While the daemon is reachable it is the cache of
+    # record; otherwise the in-process cache is used, and the daemon
+    # is tried again after DAEMON_RETRY seconds.
+    daemon = None
+    DAEMON_RETRY = 30
+    _daemon_down_until = 0
+
+    # Fields that identify how a request was signed, or that hold a
+    # login, rather than what was asked for. They are left out of the
+    # cache key and of logged requests.
+    CREDENTIAL_FIELDS = ('token', 'secret', 'password')
+
+    # With COMPRESSION set to one of CompressedResponse.CODECS, response
+    # bodies are cached compressed instead of as decoded objects, and
+    # decoded again when used. The last HOT_SIZE decoded responses are
+    # kept in __hot__ (key -> (fetched_at, obj)), most recent last.
+    COMPRESSION = None
+    HOT_SIZE = 32
+    __hot__ = collections.OrderedDict()
+    __hot_lock__ = threading.Lock()
+
+    # A file to load the cache from the first time it is used, so that
+    # starting up does not wait on unpickling it. See __cache_ensure__.
+    CACHE_FILE = None
+    _cache_loaded = False
+
     def __init__(self, authorisor):
         self._auth = authorisor
 
     @classmethod
     def clear_cache(cls):
-        cls.__cache__ = {}
+        with cls.__cache_lock__:
+            cls._cache_loaded = True
+            cls.__cache__ = {}
+            cls.__cache_keys__ = {}
+        with cls.__hot_lock__:
+            cls.__hot__.clear()
+        cls._daemon_call('invalidate')
+
+    @classmethod
+    def invalidate_section(cls, sectionid):
+        """Drop the cached responses of every request about a section.
+
+        Only the requests with a sectionid field (in the query or the
+        POST data) equal to sectionid are dropped, here and in the
+        cache daemon, along with any whose request is not known.
+        """
+        pattern = r'[?&|]sectionid={0}(?:[&|]|$)'.format(
+            re.escape(str(sectionid)))
+        regex = re.compile(pattern)
+
+        cls.__cache_ensure__()
+        with cls.__cache_lock__:
+            keys = cls.__cache_keys__
+            stale = [key for key in cls.__cache__
+                     if key not in keys or regex.search(keys[key])]
+            for key in stale:
+                del cls.__cache__[key]
+        with cls.__hot_lock__:
+            for key in stale:
+                cls.__hot__.pop(key, None)
+
+        cls._daemon_call('invalidate', None, pattern)
+
+    @classmethod
+    def use_compression(cls, codec='zlib', hot_size=32):
+        """Cache new responses compressed with codec (None to stop)."""
+        if codec is not None:
+            CompressedResponse._module(codec)
+        cls.COMPRESSION = codec
+        cls.HOT_SIZE = hot_size
+
+    @classmethod
+    def compression_report(cls):
+        """Return the sizes of the compressed responses in the cache.
+
+        'raw' and 'compressed' are total bytes, 'ratio' is raw bytes
+        per compressed byte (None with nothing compressed) and
+        'entries' counts the compressed responses out of 'total'.
+        """
+        entries = cls.__cache_snapshot__()[0].values()
+        compressed = [obj for fetched_at, obj in entries
+                      if isinstance(obj, CompressedResponse)]
+        raw = sum([obj.size for obj in compressed])
+        size = sum([len(obj.data) for obj in compressed])
+        return {'entries': len(compressed),
+                'total': len(entries),
+                'raw': raw,
+                'compressed': size,
+                'ratio': float(raw) / size if size else None,
+                'hot': len(cls.__hot__)}
+
+    @classmethod
+    def __cache_decode__(cls, key, entry):
+        """Return entry with a compressed response decoded."""
+        fetched_at, obj = entry
+        if not isinstance(obj, CompressedResponse):
+            return entry
+
+        with cls.__hot_lock__:
+            hot = cls.__hot__.pop(key, None)
+            if hot is not None and hot[0] == fetched_at:
+                cls.__hot__[key] = hot
+                cls.metric('hot_hit')
+                return hot
+
+        with _span('decompress'):
+            entry = (fetched_at, obj.decode())
+        cls.metric('decompressed')
+        cls.__hot_put__(key, entry)
+        return entry
+
+    @classmethod
+    def __hot_put__(cls, key, entry):
+        with cls.__hot_lock__:
+            cls.__hot__.pop(key, None)
+            cls.__hot__[key] = entry
+            while len(cls.__hot__) > cls.HOT_SIZE:
+                cls.__hot__.popitem(last=False)
+
+    @classmethod
+    def use_daemon(cls, path):
+        """Share the cache through the cache daemon at path (None to stop)."""
+        import cachedaemon
+        cls.daemon = cachedaemon.CacheClient(path) if path else None
+        cls._daemon_down_until = 0
+
+    @classmethod
+    def _daemon_call(cls, op, *args):
+        """Call the daemon; returns (reachable, result)."""
+        daemon = cls.daemon
+        if daemon is None or time.time() < cls._daemon_down_until:
+            return False, None
+        try:
+            return True, daemon.call(op, *args)
+        except (socket.error, RuntimeError) as e:
+            log.warning("Cache daemon unavailable, using the in-process "
+                        "cache: {0}".format(e))
+            cls._daemon_down_until = time.time() + cls.DAEMON_RETRY
+            cls.metric('daemon_down')
+            return False, None
+
+    @classmethod
+    def __cache_ensure__(cls):
+        """Load CACHE_FILE into the cache if that has not been done yet."""
+        if cls._cache_loaded or cls.CACHE_FILE is None:
+            return
+
+        with cls.__cache_lock__:
+            if cls._cache_loaded:
+                return
+            cls._cache_loaded = True
+            try:
+                with open(cls.CACHE_FILE, 'rb') as cache_file:
+                    cls.__cache_load__(cache_file)
+            except Exception as e:
+                log.debug("Failed to load cache file {0}: {1}".format(
+                    cls.CACHE_FILE, e))
+
+    @classmethod
+    def __cache_snapshot__(cls):
+        """Return copies of the cache and key dicts, taken together."""
+        cls.__cache_ensure__()
+        with cls.__cache_lock__:
+            return dict(cls.__cache__), dict(cls.__cache_keys__)
 
     @classmethod
     def __cache_save__(cls, cache_file):
-        pickle.dump(cls.__cache__, cache_file)
+        import pickle
+        cache, keys = cls.__cache_snapshot__()
+        pickle.dump(cache, cache_file)
+        pickle.dump(keys, cache_file)
+
+    @staticmethod
+    def _valid_entry(entry):
+        return isinstance(entry, tuple) and len(entry) == 2 and \
+            isinstance(entry[0], (int, long, float))
 
     @classmethod
     def __cache_load__(cls, cache_file):
-        cls.__cache__ = pickle.load(cache_file)
+        import pickle
+        cache = pickle.load(cache_file)
+        try:
+            keys = pickle.load(cache_file)
+        except EOFError:
+            # Cache written before the key descriptions were saved.
+            keys = {}
+
+        # Caches written before entries were (fetched_at, obj) used
+        # other keys too, so their entries would never be hit again.
+        stale = [key for key, entry in cache.iteritems()
+                 if not cls._valid_entry(entry)]
+        if stale:
+            log.info("Dropping {0} cache entries in an old format".format(
+                len(stale)))
+            for key in stale:
+                del cache[key]
+                keys.pop(key, None)
+
+        with cls.__cache_lock__:
+            cls.__cache__ = cache
+            cls.__cache_keys__ = keys
+
+    @classmethod
+    def canonical_request(cls, url, values):
+        """Return a normalised description of a request.
+
+        The query string and the POST fields are each sorted, values
+        are coerced to utf-8 strings and the signing credentials are
+        dropped, so equivalent requests describe the same way however
+        the caller built them.
+        """
+        import urllib
+
+        def normalise(pairs):
+            ret = []
+            for k, v in pairs:
+                if k in cls.CREDENTIAL_FIELDS:
+                    continue
+                if isinstance(v, unicode):
+                    v = v.encode('utf-8')
+                ret.append((str(k), str(v)))
+            return urllib.urlencode(sorted(ret))
+
+        parts = urlparse.urlsplit(url)
+        query = urlparse.parse_qsl(parts.query, keep_blank_values=True)
+
+        return "{0}?{1}|{2}".format(parts.path,
+                                    normalise(query),
+                                    normalise(values.items()))
+
+    @classmethod
+    def _redacted(cls, values):
+        return dict([(k, '***' if k in cls.CREDENTIAL_FIELDS else v)
+                     for k, v in values.items()])
+
+    @classmethod
+    def cache_key(cls, url, values):
+        return cls.cache_key_of(cls.canonical_request(url, values))
+
+    @staticmethod
+    def cache_key_of(canonical):
+        """Return the cache key of a canonical request."""
+        return hashlib.sha1(canonical).hexdigest()
 
     @classmethod
-    def __cache_lookup__(cls, url, data):
-        k = url + repr(data)
-        if k in cls.__cache__:
-            log.debug('Cache hit')
-            #log.debug("Cache hit: ({0}) = {1}\n".format(k,
-            #                                            cls.__cache__[k]))
-            return cls.__cache__[k]
-
-        #log.debug("Cache miss: ({0})\n"\
-        #          "Keys: {1}\n".format(k,
-        #                               cls.__cache__.keys()))
+    def cache_keys(cls):
+        """Return a dict of cache key -> canonical request."""
+        return cls.__cache_snapshot__()[1]
+
+    @classmethod
+    def __cache_lookup__(cls, key):
+        """Return (fetched_at, obj) for key or None."""
+        cls.__cache_ensure__()
+        reachable, entry = cls._daemon_call('get', key)
+        if reachable:
+            if entry is not None:
+                log.debug('Cache hit (daemon)')
+                cls.__cache_put__(key, None, entry)
+                return cls.__cache_decode__(key, entry)
+        else:
+            entry = cls.__cache__.get(key)
+            if entry is not None:
+                log.debug('Cache hit')
+                return cls.__cache_decode__(key, entry)
+
+        log.debug("Cache miss: {0}".format(cls.__cache_keys__.get(key, key)))
 
         return None
 
     @classmethod
-    def __cache_set__(cls, url, data, value):
-        cls.__cache__[url + repr(data)] = value
+    def __cache_put__(cls, key, canonical, entry):
+        cls.__cache_ensure__()
+        with cls.__cache_lock__:
+            cls.__cache__[key] = entry
+            if canonical is not None:
+                cls.__cache_keys__[key] = canonical
 
-    def __call__(self, query, fields=None, authorising=False, clear_cache=False, debug=False):
+    @classmethod
+    def __cache_set__(cls, key, canonical, value, raw=None):
+        """Cache value, or its body raw compressed if COMPRESSION is set."""
+        entry = (time.time(), value)
+        if cls.COMPRESSION is not None and raw is not None:
+            cls.__hot_put__(key, entry)
+            with _span('compress'):
+                entry = (entry[0], CompressedResponse(cls.COMPRESSION, raw))
+        cls.__cache_put__(key, canonical, entry)
+        cls._daemon_call('set', key, canonical, entry)
 
-        if clear_cache:
-            self.clear_cache()
+    @classmethod
+    def __cache_remove__(cls, key):
+        cls.__cache_ensure__()
+        with cls.__hot_lock__:
+            cls.__hot__.pop(key, None)
+        with cls.__cache_lock__:
+            cls.__cache__.pop(key, None)
+            cls.__cache_keys__.pop(key, None)
 
-        url = self.BASE_URL + query
+    @classmethod
+    def metric(cls, name, count=1):
+        with cls.__cache_lock__:
+            cls.metrics[name] += count
 
+    def _values(self, fields=None, authorising=False):
         values = {'apiid': self._auth.apiid,
                   'token': self._auth.token}
 
@@ -145,47 +733,241 @@ class Accessor(object):
         if fields:
             values.update(fields)
 
-        if debug:
-            log.debug("{0} {1}".format(url, values))
+        return values
+
+    def forget(self, query, fields=None, authorising=False):
+        """Remove a request's response from the cache."""
+        key = self.explain(query, fields, authorising)['key']
+        self.__class__.__cache_remove__(key)
+
+    def _derived_key(self, query, tag):
+        canonical = self.explain(query)['canonical'] + '#' + tag
+        return self.__class__.cache_key_of(canonical), canonical
+
+    def derived(self, query, tag, derive, refresh=False):
+        """Return derive(response to query), cached under query and tag.
+
+        This lets a caller keep a smaller form of a response, such as
+        a projection, in place of the response itself: the response is
+        dropped from the cache once derive has been called on it. The
+        derived value is served, kept stale or fetched again under the
+        same FRESH_TTL, STALE_WHILE_REVALIDATE and MAX_STALE policy as
+        responses.
+        """
+        key, canonical = self._derived_key(query, tag)
+
+        value = None
+        if not refresh:
+            value = self._cached(key, canonical, functools.partial(
+                self._derive, query, derive, True))
+
+        if not value:
+            value = self._fetch_once(key, canonical, functools.partial(
+                self._derive, query, derive, refresh), refresh)
+        return value
+
+    def _derive(self, query, derive, refresh):
+        value = derive(self(query, refresh=refresh))
+        self.forget(query)
+        return value, None
+
+    def explain(self, query, fields=None, authorising=False):
+        """Describe how a request would be looked up in the cache.
+
+        Returns a dict holding the cache 'key', the 'canonical' request
+        it was derived from and whether it is currently 'cached'.
+        """
+        url = self.BASE_URL + query
+        values = self._values(fields, authorising)
+        canonical = self.canonical_request(url, values)
+        key = self.cache_key_of(canonical)
 
-        data = urllib.urlencode(values)
+        self.__cache_ensure__()
+        return {'key': key,
+                'canonical': canonical,
+                'cached': key in self.__class__.__cache__}
 
-        req = urllib2.Request(url, data)
+    def _fetch(self, url, values, data):
+        """Make a request; returns the decoded response and its body."""
+        if self.throttle is not None:
+            self.throttle.wait()
 
-        obj = self.__class__.__cache_lookup__(url, data)
+        parts = urlparse.urlsplit(url)
+        action = dict(urlparse.parse_qsl(parts.query)).get('action')
+        name = parts.path.lstrip('/') + (' ' + action if action else '')
 
-        if not obj:
+        import urllib2
 
-            response = urllib2.urlopen(req)
+        with _span('fetch ' + name):
+            response = urllib2.urlopen(urllib2.Request(url, data))
 
             result = response.read()
 
-            
-            # Crude test to see if the response is JSON
-            # OSM returns a string as an error case.
-            try:
-                if result[0] not in ('[', '{'):
-                    log.debug("{0} {1}".format(url, values))
-                    raise OSMException(url, values, result)
-            except IndexError:
-                # This means that result is not a list
-                log.debug("{0} {1}".format(url, values))
-                log.error(repr(result))
-                raise
-
+        # Crude test to see if the response is JSON
+        # OSM returns a string as an error case.
+        try:
+            if result[0] not in ('[', '{'):
+                log.debug("{0} {1}".format(url, self._redacted(values)))
+                raise OSMException(url, self._redacted(values), result)
+        except IndexError:
+            # This means that result is not a list
+            log.debug("{0} {1}".format(url, self._redacted(values)))
+            log.error(repr(result))
+            raise
+
+        with _span('json.loads'):
             obj = json.loads(result)
 
-            if 'error' in obj:
-                log.debug("{0} {1}".format(url, values))
-                raise OSMException(url, values, obj['error'])
-            if 'err' in obj:
-                log.debug("{0} {1}".format(url, values))
-                raise OSMException(url, values, obj['err'])
+        if 'error' in obj:
+            log.debug("{0} {1}".format(url, self._redacted(values)))
+            raise OSMException(url, self._redacted(values), obj['error'])
+        if 'err' in obj:
+            log.debug("{0} {1}".format(url, self._redacted(values)))
+            raise OSMException(url, self._redacted(values), obj['err'])
+
+        return obj, result
+
+    def _fetch_once(self, key, canonical, fetch, refresh=False):
+        """Fetch a request, sharing the result with concurrent callers.
+
+        fetch() returns the (response, body) to cache under key. Only
+        one thread fetches a given key at a time; the others wait
+        for it and then read its result from the cache. If the fetch
+        failed a waiter tries again itself. With a cache daemon the
+        fetching thread also takes the daemon's lease on the key, so
+        only one process fetches it; unless refresh is set, a result
+        another process stored meanwhile is used instead.
+        """
+        cls = self.__class__
+
+        while True:
+            with cls.__inflight_lock__:
+                pending = cls.__inflight__.get(key)
+                if pending is None:
+                    pending = cls.__inflight__[key] = threading.Event()
+                    break
+
+            pending.wait()
+            entry = cls.__cache_lookup__(key)
+            if entry is not None and entry[1]:
+                return entry[1]
+
+        leased = False
+        try:
+            if not refresh:
+                # Another thread may have stored a response between the
+                # caller's cache lookup and taking the slot above.
+                entry = cls.__cache_lookup__(key)
+                if entry is not None and entry[1] and self._fresh(entry):
+                    return entry[1]
+
+                leased, lease = cls._daemon_call('lease', key)
+                if leased and lease[0] == 'hit':
+                    leased = False
+                    cls.__cache_put__(key, canonical, lease[1])
+                    return cls.__cache_decode__(key, lease[1])[1]
+
+            obj, raw = fetch()
+            leased = False
+            cls.__cache_set__(key, canonical, obj, raw)
+            return obj
+        finally:
+            if leased:
+                cls._daemon_call('release', key)
+            with cls.__inflight_lock__:
+                del cls.__inflight__[key]
+            pending.set()
+
+    def _cached(self, key, canonical, fetch):
+        """Return the cached response for key if it may be served.
+
+        A stale response is returned under stale-while-revalidate, and
+        a background refresh of it with fetch is started.
+        """
+        cls = self.__class__
+
+        entry = cls.__cache_lookup__(key)
+        if entry is None:
+            return None
+
+        fetched_at, obj = entry
+        age = time.time() - fetched_at
+
+        if self._fresh(entry):
+            return obj
+
+        if self.STALE_WHILE_REVALIDATE and \
+                (self.MAX_STALE is None or age < self.MAX_STALE):
+            cls.metric('stale_served')
+            log.info("Serving stale response ({0:.0f}s old): {1}".format(
+                age, canonical))
+
+            if key not in cls.__inflight__:
+                thread = threading.Thread(target=self._revalidate,
+                                          args=(key, canonical, fetch))
+                thread.daemon = True
+                thread.start()
+
+            return obj
+
+        cls.metric('expired')
+        return None
+
+    def _fresh(self, entry):
+        return self.FRESH_TTL is None or \
+            time.time() - entry[0] < self.FRESH_TTL
+
+    def _revalidate(self, key, canonical, fetch):
+        try:
+            self._fetch_once(key, canonical, fetch, refresh=True)
+            self.__class__.metric('revalidated')
+        except Exception as e:
+            self.__class__.metric('revalidate_failed')
+            log.warning("Background refresh failed: {0}: {1}".format(
+                canonical, e))
+
+    def __call__(self, query, fields=None, authorising=False, clear_cache=False, debug=False,
+                 refresh=False):
+        """Make a request, answering from the cache where possible.
+
+        refresh skips the cache lookup for this one request and stores
+        the new response in its place.
+        """
+
+        if clear_cache:
+            self.clear_cache()
+
+        url = self.BASE_URL + query
+
+        values = self._values(fields, authorising)
+
+        if debug:
+            log.debug("{0} {1}".format(url, self._redacted(values)))
+
+        import urllib
+        data = urllib.urlencode(values)
+
+        if authorising:
+            # The response holds the user's secret, so it is never cached.
+            obj = self._fetch(url, values, data)[0]
+            if debug:
+                log.debug("Authorised as {0}".format(obj.get('userid')))
+            return obj
+
+        canonical = self.canonical_request(url, values)
+        key = self.cache_key_of(canonical)
+
+        fetch = functools.partial(self._fetch, url, values, data)
 
-            self.__class__.__cache_set__(url, data, obj)
+        obj = None
+        if not refresh:
+            obj = self._cached(key, canonical, fetch)
+
+        if not obj:
+            obj = self._fetch_once(key, canonical, fetch, refresh)
 
         if debug:
-            log.debug(pp.pformat(obj))
+            log.debug(_pformat(obj))
         return obj
 
 
@@ -217,45 +999,363 @@ class Authorisor(object):
 
 
 class Term(OSMObject):
+    @_profiled('Term.__init__')
     def __init__(self, osm, accessor, record):
         OSMObject.__init__(self, osm, accessor, record)
 
-        self.startdate = datetime.datetime.strptime(record[u'startdate'],
-                                                    '%Y-%m-%d')
+        self.startdate = parse_date(record[u'startdate'])
+
+        self.enddate = parse_date(record[u'enddate'])
+
+    def is_active(self, date=None):
+        if date is None:
+            date = datetime.datetime.now()
+        return (self.startdate < date) and (self.enddate > date)
+
+
+class TermIndex(object):
+    """The terms of every section, parsed once from getTerms.
+
+    Each section's terms are sorted by start date so that the terms
+    active on any date can be found with a binary search.
+
+    When more than one term is active the policy decides which one
+    current() returns:
+
+      LATEST   - the term that started most recently (the default).
+      EARLIEST - the term that started first.
+      STRICT   - raise TermError.
+    """
+
+    LATEST = 'latest'
+    EARLIEST = 'earliest'
+    STRICT = 'strict'
+
+    @_profiled('TermIndex.__init__')
+    def __init__(self, osm, accessor, record, policy=LATEST):
+        self.policy = policy
+
+        self._terms = {}
+        self._starts = {}
+        self._max_ends = {}
+
+        for sectionid, records in record.items():
+            terms = sorted([Term(osm, accessor, term) for term in records],
+                           key=lambda term: (term.startdate, term.enddate))
+
+            # _max_ends[i] is the latest end date of terms[0..i], which
+            # lets active() stop scanning back as soon as no earlier
+            # term can still be running.
+            max_ends = []
+            for term in terms:
+                if max_ends and max_ends[-1] > term.enddate:
+                    max_ends.append(max_ends[-1])
+                else:
+                    max_ends.append(term.enddate)
+
+            self._terms[sectionid] = terms
+            self._starts[sectionid] = [term.startdate for term in terms]
+            self._max_ends[sectionid] = max_ends
+
+    def terms(self, sectionid):
+        """Return all the terms of a section, ordered by start date."""
+        return list(self._terms.get(sectionid, []))
+
+    def active(self, sectionid, date=None):
+        """Return the terms of a section active on date (default now)."""
+        if date is None:
+            date = datetime.datetime.now()
+
+        terms = self._terms.get(sectionid, [])
+        max_ends = self._max_ends.get(sectionid, [])
+
+        ret = []
+        i = bisect.bisect_left(self._starts.get(sectionid, []), date) - 1
+        while i >= 0 and max_ends[i] > date:
+            if terms[i].enddate > date:
+                ret.append(terms[i])
+            i -= 1
+
+        ret.reverse()
+        return ret
+
+    def current(self, sectionid, date=None):
+        """Return the single term of a section active on date.
+
+        Raises TermError if there is no active term, or if there is
+        more than one and the policy is STRICT.
+        """
+        terms = self.active(sectionid, date)
+
+        if not terms:
+            raise TermError("No active term for section {0}".format(
+                sectionid))
+
+        if len(terms) > 1:
+            names = ", ".join([term['name'] for term in terms])
+            if self.policy == self.STRICT:
+                raise TermError("Section {0} has more than one "
+                                "active term: {1}".format(sectionid, names))
+
+            log.warning("Section {0} has more than one active term: "
+                        "{1}; using the {2}".format(sectionid, names,
+                                                    self.policy))
+
+            if self.policy == self.EARLIEST:
+                return terms[0]
+
+        return terms[-1]
+
+
+class Event(OSMObject):
+    def __init__(self, osm, accessor, section, term, record):
+        OSMObject.__init__(self, osm, accessor, record)
+
+        self._section = section
+        self._term = term
+        self._attendance = None
+
+        self.startdate, self.enddate = parse_dates(
+            [record.get('startdate'), record.get('enddate')])
+
+    def __repr__(self):
+        return 'Event({0}, "{1}")'.format(self['eventid'], self['name'])
 
-        self.enddate = datetime.datetime.strptime(record[u'enddate'],
-                                                  '%Y-%m-%d')
+    def attendance(self):
+        """Return the attendee records, fetching them the first time."""
+        if self._attendance is None:
+            url = "events.php?action=getEventAttendance" \
+                  "&eventid={0}" \
+                  "&sectionid={1}" \
+                  "&termid={2}" \
+                .format(self['eventid'],
+                        self._section['sectionid'],
+                        self._term['termid'])
 
-    def is_active(self):
-        now = datetime.datetime.now()
-        return (self.startdate < now) and (self.enddate > now)
+            self._attendance = [OSMObject(self._osm, self._accessor, record)
+                                for record in self._accessor(url)['items']]
+
+        return self._attendance
+
+
+class Register(object):
+    """The attendance register of a section for one term.
+
+    The register is held as a bit matrix of members x meetings. Each
+    member has two bitmasks over the meetings: the meetings they
+    attended and the meetings they were marked for at all (attended or
+    absent). Bit i refers to meetings[i], which are in date order.
+    """
+
+    DATE_COLUMN = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+    def __init__(self, osm, accessor, section, term, record=None):
+        self._osm = osm
+        self._accessor = accessor
+        self._section = section
+        self._term = term
+
+        self.meetings = []
+        self.scoutids = []
+        self._rows = {}
+        self._attended = []
+        self._marked = []
+
+        if record is None:
+            record = accessor(self._url())
+        self._add_meetings(record)
+
+    def __repr__(self):
+        return 'Register({0}, {1} members, {2} meetings)'.format(
+            self._term['termid'], len(self.scoutids), len(self.meetings))
+
+    def __getitem__(self, key):
+        """register[scoutid, date] -> True, False or None if unmarked."""
+        scoutid, date = key
+        row = self._rows[scoutid]
+        try:
+            bit = 1 << self.meetings.index(_as_datetime(date))
+        except ValueError:
+            raise KeyError(key)
+        if not self._marked[row] & bit:
+            return None
+        return bool(self._attended[row] & bit)
+
+    def _url(self):
+        return "users.php?action=register" \
+               "&sectionid={0}" \
+               "&termid={1}" \
+            .format(self._section['sectionid'], self._term['termid'])
+
+    def _add_meetings(self, record):
+        """Decode the meeting columns of record from the last held on.
+
+        The last meeting held is decoded again, as its marks may not
+        have been entered when it was first fetched. Returns the dates
+        of the meetings added, and of the last one if it changed.
+        """
+        last = self.meetings[-1] if self.meetings else None
+
+        columns = set()
+        for item in record['items']:
+            columns.update([key for key in item
+                            if self.DATE_COLUMN.match(key)])
+
+        dates = sorted([(parse_date(column), column)
+                        for column in columns])
+        dates = [(date, column) for date, column in dates
+                 if last is None or date >= last]
+
+        bits = []
+        for date, column in dates:
+            if date != last:
+                self.meetings.append(date)
+            bits.append(len(self.meetings) - 1)
+
+        # Bits of the columns decoded again, cleared before decoding.
+        redecoded = sum([1 << bit for (date, column), bit in zip(dates, bits)
+                         if date == last])
+        changed = set()
+
+        for item in record['items']:
+            scoutid = item['scoutid']
+            try:
+                row = self._rows[scoutid]
+            except KeyError:
+                row = self._rows[scoutid] = len(self.scoutids)
+                self.scoutids.append(scoutid)
+                self._attended.append(0)
+                self._marked.append(0)
+
+            attended = 0
+            marked = 0
+            for (date, column), bit in zip(dates, bits):
+                value = item.get(column, '')
+                if value == 'Yes':
+                    attended |= 1 << bit
+                    marked |= 1 << bit
+                elif value:
+                    marked |= 1 << bit
+
+            if (self._attended[row] & redecoded) != (attended & redecoded) \
+                    or (self._marked[row] & redecoded) != (marked & redecoded):
+                changed.add(last)
+
+            self._attended[row] = (self._attended[row] & ~redecoded) | attended
+            self._marked[row] = (self._marked[row] & ~redecoded) | marked
+
+        return [date for date, column in dates
+                if date != last or date in changed]
+
+    def refresh(self):
+        """Fetch the register again and add any new meetings.
+
+        Only the last meeting held and those after it are decoded; the
+        older columns are left untouched. Returns the dates of the new
+        meetings, and of the last one held if its marks changed.
+        """
+        return self._add_meetings(self._accessor(self._url(), refresh=True))
+
+    def attended(self, scoutid):
+        return _popcount(self._attended[self._rows[scoutid]])
+
+    def rate(self, scoutid):
+        """Fraction of the marked meetings that scoutid attended."""
+        row = self._rows[scoutid]
+        marked = _popcount(self._marked[row])
+        if not marked:
+            return None
+        return float(_popcount(self._attended[row])) / marked
+
+    def rates(self):
+        """Return a dict of scoutid -> attendance rate."""
+        return dict([(scoutid, self.rate(scoutid))
+                     for scoutid in self.scoutids])
+
+    def current_streak(self, scoutid):
+        """Number of meetings attended in a row up to the latest one."""
+        full = (1 << len(self.meetings)) - 1
+        missed = ~self._attended[self._rows[scoutid]] & full
+        return len(self.meetings) - missed.bit_length()
+
+    def longest_streak(self, scoutid):
+        """Longest run of consecutive meetings attended."""
+        bits = self._attended[self._rows[scoutid]]
+        streak = 0
+        while bits:
+            bits &= bits >> 1
+            streak += 1
+        return streak
+
+    def above(self, threshold):
+        """Return the scoutids whose attendance rate is >= threshold."""
+        return [scoutid for scoutid, rate in self.rates().items()
+                if rate is not None and rate >= threshold]
+
+    def below(self, threshold):
+        """Return the scoutids whose attendance rate is < threshold."""
+        return [scoutid for scoutid, rate in self.rates().items()
+                if rate is not None and rate < threshold]
+
+    def meeting_totals(self):
+        """Return a list of (date, number attending) per meeting."""
+        return [(date, sum([(bits >> i) & 1 for bits in self._attended]))
+                for i, date in enumerate(self.meetings)]
 
 
 class Badge(OSMObject):
     def __init__(self, osm, accessor, section, badge_type, details, structure):
         self._section = section
         self._badge_type = badge_type
+        self._structure = structure
+        self._activities = None
         self.name = details['name']
         self.table = details['table']
 
-        activities = {}
-        if len(structure) > 1:
-            for activity in [row['name'] for row in structure[1]['rows']]:
-                activities[activity] = ''
-
-        OSMObject.__init__(self, osm, accessor, activities)
-
-    def get_members(self):
-        url = "challenges.php?"\
+        OSMObject.__init__(self, osm, accessor, None)
+
+    @property
+    def _record(self):
+        # The activity table is only built the first time it is used.
+        if self._activities is None:
+            activities = {}
+            if len(self._structure) > 1:
+                for activity in [row['name'] for row in self._structure[1]['rows']]:
+                    activities[activity] = ''
+            self._activities = activities
+
+        return self._activities
+
+    @_record.setter
+    def _record(self, value):
+        self._activities = value
+
+    def activity_fields(self):
+        """Return (field, name) for each activity column of the badge."""
+        if len(self._structure) < 2:
+            return []
+        return [(row.get('field', row['name']), row['name'])
+                for row in self._structure[1]['rows']]
+
+    @staticmethod
+    def members_query(termid, badge_type, sectionid, section, name):
+        return "challenges.php?"\
             "&termid={0}" \
             "&type={1}" \
             "&sectionid={2}" \
             "&section={3}" \
-            "&c={4}".format(self._section.term['termid'],
-                            self._badge_type,
-                            self._section['sectionid'],
-                            self._section['section'],
-                            self.name.lower())
+            "&c={4}".format(termid,
+                            badge_type,
+                            sectionid,
+                            section,
+                            name.lower())
+
+    def get_members(self):
+        url = self.members_query(self._section.term['termid'],
+                                 self._badge_type,
+                                 self._section['sectionid'],
+                                 self._section['section'],
+                                 self.name)
         
         return [ OSMObject(self._osm,
                            self._accessor,
@@ -263,6 +1363,13 @@ class Badge(OSMObject):
                            self._accessor(url)['items'] ]
 
 class Badges(OSMObject):
+    """The badges of one type for a section.
+
+    The raw getInitialBadges payload is kept and each Badge is only
+    built the first time it is looked up. Iteration follows badgeOrder.
+    """
+
+    @_profiled('Badges.__init__')
     def __init__(self, osm, accessor, record, section, badge_type):
         self._section = section
         self._badge_type = badge_type
@@ -271,19 +1378,56 @@ class Badges(OSMObject):
         self._stock = record['stock']
         self._structure = record['structure']
 
-        badges = {}
-        for badge in self._details.keys():
-            badges[badge] = Badge(osm, accessor,
-                                  self._section,
-                                  self._badge_type,
-                                  self._details[badge],
-                                  self._structure[badge])
+        OSMObject.__init__(self, osm, accessor, {})
+
+    def __getitem__(self, key):
+        try:
+            return self._record[key]
+        except KeyError:
+            pass
+
+        try:
+            details = self._details[key]
+        except KeyError:
+            raise KeyError("%r object has no attribute %r" %
+                           (type(self).__name__, key))
+
+        badge = Badge(self._osm, self._accessor,
+                      self._section,
+                      self._badge_type,
+                      details,
+                      self._structure[key])
 
-        OSMObject.__init__(self, osm, accessor, badges)
+        # If another thread built the badge first, use theirs.
+        return self._record.setdefault(key, badge)
+
+    def __contains__(self, key):
+        return key in self._details
+
+    def __len__(self):
+        return len(self._details)
+
+    def __iter__(self):
+        return iter(self.order())
+
+    def order(self):
+        """Return the badge keys, in badgeOrder first."""
+        order = self._order
+        if isinstance(order, basestring):
+            order = [key for key in order.split(',') if key]
+
+        ret = [key for key in order if key in self._details]
+        seen = set(ret)
+        ret.extend(sorted([key for key in self._details
+                           if key not in seen]))
+        return ret
 
 
 class Member(OSMObject):
 
+    # Used to guard edits when the member has no section to lock.
+    _default_lock = threading.RLock()
+
     def __init__(self, osm, section, accessor, column_map, record):
         OSMObject.__init__(self, osm, accessor, record)
 
@@ -293,7 +1437,9 @@ class Member(OSMObject):
             self._column_map[k] = v.replace(' ', '')
 
         self._reverse_column_map = dict((reversed(list(i)) for i in column_map.items()))
-        self._changed_keys = []
+
+        # Raw column -> value before the first edit since the last save.
+        self._baseline = collections.OrderedDict()
 
     def __getattr__(self, key):
         try:
@@ -317,24 +1463,32 @@ class Member(OSMObject):
                                (type(self).__name__, key))
 
 
-        
+    def _edit_lock(self):
+        # Edits to the members of a section share the section's lock.
+        return getattr(self._section, '_lock', self._default_lock)
+
     def __setitem__(self, key, value):
-        try:
-            self._record[key] = value
-            if key not in self._changed_keys:
-                self._changed_keys.append(key)
-        except:
-            try:
-                self._record[self._reverse_column_map[key]] = value
-                if self._reverse_column_map[key] not in self._changed_keys:
-                    self._changed_keys.append(self._reverse_column_map[key])
- 
-            except:
-                raise KeyError("%r object has no attribute %r" %
-                               (type(self).__name__, key))
+        with self._edit_lock():
+            self._set(key, value)
 
-            raise KeyError("%r object has no attribute %r" %
-                           (type(self).__name__, key))
+        for listener in getattr(self._osm, 'listeners', ()):
+            listener(self._section, self, key)
+
+    def _column(self, key):
+        """Return the raw column for a raw or friendly name.
+
+        A name that is neither is taken as a new raw column, which
+        new_member() relies on for columns missing from DEFAULT_DICT.
+        """
+        if key in self._record:
+            return key
+        return self._reverse_column_map.get(key, key)
+
+    def _set(self, key, value):
+        column = self._column(key)
+        if column not in self._baseline:
+            self._baseline[column] = self._record.get(column)
+        self._record[column] = value
 
     # def remove(self, last_date):
     #     """Remove the member record."""
@@ -346,41 +1500,118 @@ class Member(OSMObject):
         
     #     self._accessor(delete_url, fields, clear_cache=True, debug=True)
 
-    def save(self):
-        """Write the member to the section."""
+    def changes(self):
+        """Return the fields edited since the last save that really differ.
+
+        The result maps each raw column to a FieldChange of its value
+        at the last save and its value now. Fields set back to their
+        old value, or set to the value they already had, are left out.
+        """
+        with self._edit_lock():
+            return collections.OrderedDict(
+                [(column, FieldChange(column, old, self._record.get(column)))
+                 for column, old in self._baseline.items()
+                 if self._record.get(column) != old])
+
+    def save(self, dry_run=False):
+        """Write the member's changed fields to the section.
+
+        Only fields whose value differs from that at the last save are
+        sent, so saving an unchanged member makes no requests. With
+        dry_run set nothing is written and the changes() that would be
+        are returned.
+
+        If write-behind is enabled on the OSM the changes are queued
+        and a PendingWrite is returned instead.
+        """
+        write_behind = getattr(self._osm, 'write_behind', None)
+
+        with self._edit_lock():
+            changes = self.changes()
+            if dry_run:
+                return changes
+
+            suppressed = len(self._baseline) - len(changes)
+            if suppressed:
+                self._accessor.metric('writes_suppressed', suppressed)
+            baseline, self._baseline = \
+                self._baseline, collections.OrderedDict()
+
+        if write_behind is not None:
+            try:
+                return write_behind.queue(self, changes)
+            except Exception:
+                self._unsaved(baseline)
+                raise
+
+        try:
+            return self._write(dict([(column, change.new)
+                                     for column, change in changes.items()]))
+        except Exception:
+            self._unsaved(baseline)
+            raise
+
+    def _unsaved(self, baseline):
+        """Put back the baseline (column -> old value) of a failed write.
+
+        The edits then show in changes() again, so saving again retries
+        them.
+        """
+        with self._edit_lock():
+            for column, old in baseline.items():
+                self._baseline[column] = old
+
+    def _write(self, fields):
         update_url='users.php?action=updateMember&dateFormat=generic'
         patrol_url='users.php?action=updateMemberPatrol'
         create_url='users.php?action=newMember'
 
         if self['scoutid'] == '':
             # create
-            fields = {}
-            for key in self._changed_keys:
-                fields[key] = self._record[key]
+            fields = dict(fields)
             fields['sectionid'] = self._section['sectionid']
-            record = self._accessor(create_url, fields, clear_cache=True, debug=True)
-            self['scoutid'] = record['scoutid']
+            record = self._accessor(create_url, fields, debug=True,
+                                    refresh=True)
+            self._record['scoutid'] = record['scoutid']
+            self._accessor.invalidate_section(self._section['sectionid'])
         else:
             # update
-            fields = {}
-            for key in self._changed_keys:
-                fields[key] = self._record[key]
-
             result = True
             for key in fields:
+                column = self._reverse_column_map.get(key, key)
                 record = self._accessor(update_url, 
                                         { 'scoutid': self['scoutid'],
-                                          'column': self._reverse_column_map[key],
+                                          'column': column,
                                           'value': fields[key],
                                           'sectionid': self._section['sectionid'] }, 
-                                        clear_cache=True, debug=True)
-                if record[self._reverse_column_map[key]] != fields[key]:
+                                        debug=True, refresh=True)
+                if record[column] != fields[key]:
                     result = False
 
+            # Writes go to OSM (refresh), and then only this section's
+            # cached responses are dropped, not those of every section.
+            if fields:
+                self._accessor.invalidate_section(self._section['sectionid'])
+
             # TODO handle change to grouping.
 
             return result
 
+    def date(self, key):
+        """Return a date field (raw or friendly name) as a datetime.
+
+        Raises ValueError if key is not one of Members.DATE_FIELDS.
+        """
+        Members.check_date_field(self._column(key))
+        return parse_date(self[key], Members.DATE_FORMAT)
+
+    def age(self, date=None):
+        """Return the member's (years, months) age on date (default today)."""
+        dob = self.date('dob')
+        if dob is None:
+            return None
+        return age_at(dob, _as_datetime(date) or datetime.datetime.now())
+
     def get_badges(self):
         "Return a list of badges objects for this member."
 
@@ -391,6 +1622,302 @@ class Member(OSMObject):
         return ret
         
         
+class ValuePool(object):
+    """Share one copy of repeated keys and values between records.
+
+    Member records repeat the same column names and, for many columns,
+    the same few values (patrol names, flags, schools, empty strings).
+    intern_records() replaces each record in a list with one whose keys
+    and low-cardinality values come from the pool. One pool can be
+    shared by every section held in a process.
+    """
+
+    # Columns that are always interned.
+    LOW_CARDINALITY = ('patrol', 'patrolid', 'patrolleader', 'type',
+                       'school', 'religion', 'ethnicity', 'subs',
+                       'started', 'joined', 'startedsection')
+
+    # Other columns are interned when they have no more than this
+    # fraction of distinct values.
+    MAX_CARDINALITY = 0.5
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+        self.saved = 0
+
+    def __len__(self):
+        return len(self._values)
+
+    def intern(self, value):
+        if not isinstance(value, basestring):
+            return value
+        try:
+            pooled = self._values[value]
+        except KeyError:
+            self._values[value] = value
+            return value
+        if pooled is not value:
+            self.saved += sys.getsizeof(value)
+        return pooled
+
+    def _low_cardinality(self, records):
+        distinct = collections.defaultdict(set)
+        for record in records:
+            for k, v in record.iteritems():
+                if isinstance(v, basestring):
+                    distinct[k].add(v)
+
+        limit = max(1, int(len(records) * self.MAX_CARDINALITY))
+        return set([k for k, values in distinct.items()
+                    if len(values) <= limit]) | set(self.LOW_CARDINALITY)
+
+    def intern_records(self, records):
+        """Intern the keys and low-cardinality values of records in place.
+
+        Returns the number of bytes saved.
+        """
+        with self._lock:
+            saved = self.saved
+            low = self._low_cardinality(records)
+            intern = self.intern
+
+            for i, record in enumerate(records):
+                records[i] = dict([(intern(k), intern(v) if k in low else v)
+                                   for k, v in record.iteritems()])
+
+            return self.saved - saved
+
+
+def _sizeof_records(records):
+    """Return (shared, unshared) bytes of the keys and values of records.
+
+    shared counts each distinct object once; unshared counts it once
+    for every record it appears in.
+    """
+    seen = set()
+    shared = 0
+    unshared = 0
+    for record in records:
+        for item in record.iteritems():
+            for obj in item:
+                size = sys.getsizeof(obj)
+                unshared += size
+                if id(obj) not in seen:
+                    seen.add(id(obj))
+                    shared += size
+    return shared, unshared
+
+
+class _Sizer(object):
+    """Measure the memory held by object graphs.
+
+    Each object is counted once, by whichever walk reaches it first,
+    so walking several owners in turn attributes shared objects to the
+    first. Objects passed as boundaries are never entered, which stops
+    a walk from climbing back up through references such as
+    Member._section.
+    """
+
+    SKIP = (type, types.ModuleType, types.FunctionType,
+            types.BuiltinFunctionType, types.MethodType)
+
+    def __init__(self, boundaries=()):
+        self._seen = set([id(obj) for obj in boundaries])
+        self.types = collections.Counter()
+
+    def release(self, obj):
+        """Stop treating obj as a boundary so that it can be walked."""
+        self._seen.discard(id(obj))
+
+    def walk(self, *objs):
+        """Return (bytes, objects) reachable from objs and not yet seen."""
+        size = 0
+        count = 0
+        stack = list(objs)
+        while stack:
+            obj = stack.pop()
+            if id(obj) in self._seen or isinstance(obj, self.SKIP):
+                continue
+            self._seen.add(id(obj))
+
+            size += sys.getsizeof(obj)
+            count += 1
+            self.types[type(obj).__name__] += 1
+
+            if isinstance(obj, dict):
+                stack.extend(obj.keys())
+                stack.extend(obj.values())
+            elif isinstance(obj, (list, tuple, set, frozenset, collections.deque)):
+                stack.extend(obj)
+            if hasattr(obj, '__dict__'):
+                stack.append(obj.__dict__)
+
+        return size, count
+
+
+FieldChange = collections.namedtuple('FieldChange', 'column old new')
+
+
+class PendingWrite(object):
+    """The eventual result of a member save queued by WriteBehind."""
+
+    def __init__(self, member):
+        self.member = member
+        self._done = threading.Event()
+        self._result = None
+        self._error = None
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def done(self):
+        return self._done.is_set()
+
+    def result(self, timeout=None):
+        """Wait for the write and return the result of Member.save()."""
+        if not self._done.wait(timeout):
+            raise RuntimeError("Write of {0} not finished".format(
+                self.member['scoutid']))
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def exception(self, timeout=None):
+        self._done.wait(timeout)
+        return self._error
+
+    def add_done_callback(self, callback):
+        """Call callback(pending_write) once the write has finished."""
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def _finish(self, result=None, error=None):
+        with self._lock:
+            self._result = result
+            self._error = error
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception:
+                log.exception("Write-behind callback failed")
+
+
+class WriteBehind(object):
+    """Write member changes from a background thread.
+
+    Saved members are queued rather than written. Repeated edits to a
+    member that is still queued are merged, so only the last value of
+    each field is sent, and fields edited back to the value they had
+    when first queued are not sent at all. The queue is flushed every interval seconds,
+    or sooner once max_pending members are waiting.
+
+    flush() blocks until everything queued so far is written and
+    close() flushes and stops the thread. close() is also registered
+    with atexit so queued edits are not lost at shutdown.
+    """
+
+    def __init__(self, interval=5.0, max_pending=50):
+        self.interval = interval
+        self.max_pending = max_pending
+
+        self._pending = collections.OrderedDict()
+        self._outstanding = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+        atexit.register(self.close)
+
+    def queue(self, member, changes):
+        """Queue a member's changes (column -> FieldChange) to be written.
+
+        Returns a PendingWrite.
+        """
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("WriteBehind is closed")
+
+            try:
+                member, queued, pending = self._pending[id(member)]
+                for column, change in changes.items():
+                    if column in queued:
+                        change = change._replace(old=queued[column].old)
+                    queued[column] = change
+            except KeyError:
+                pending = PendingWrite(member)
+                self._pending[id(member)] = (member, dict(changes), pending)
+                self._outstanding.add(pending)
+
+            if len(self._pending) >= self.max_pending:
+                self._wakeup.set()
+
+        return pending
+
+    def _take(self):
+        with self._lock:
+            batch = self._pending.values()
+            self._pending = collections.OrderedDict()
+            self._wakeup.clear()
+        return batch
+
+    def _write(self, batch):
+        for member, changes, pending in batch:
+            # Edits that were put back while queued need not be sent.
+            fields = dict([(column, change.new)
+                           for column, change in changes.items()
+                           if change.new != change.old])
+            try:
+                pending._finish(result=member._write(fields))
+            except Exception as e:
+                log.error("Write-behind of {0} failed: {1}".format(
+                    member['scoutid'], e))
+                member._unsaved(dict([(column, change.old)
+                                      for column, change in changes.items()]))
+                pending._finish(error=e)
+
+            with self._lock:
+                self._outstanding.discard(pending)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._write(self._take())
+
+            with self._lock:
+                if self._closed and not self._pending:
+                    return
+
+    def flush(self, timeout=None):
+        """Write everything queued so far and wait for it to finish."""
+        with self._lock:
+            outstanding = list(self._outstanding)
+        self._wakeup.set()
+
+        for pending in outstanding:
+            pending._done.wait(timeout)
+
+    def close(self, timeout=None):
+        """Flush the queue and stop the background thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+
+        self.flush(timeout)
+        self._wakeup.set()
+        self._thread.join(timeout)
+
+
 class Members(OSMObject):
     DEFAULT_DICT = {  u'address': '',
                       u'address2': '',
@@ -432,22 +1959,141 @@ class Members(OSMObject):
                       u'type': u'',
                       u'yrs': 0}
 
-    def __init__(self, osm, section, accessor, column_map, record):
+    @_profiled('Members.__init__')
+    def __init__(self, osm, section, accessor, column_map, record, columns=None):
         self._osm = osm,
         self._section = section
         self._accessor = accessor,
         self._column_map = column_map
         self._identifier = record['identifier']
+        self._columns = self._project(columns)
+        self._interned = 0
+
+        # Interning rewrites the decoded records in place, so the
+        # cached response shares the pooled values too.
+        pool = getattr(osm, 'value_pool', None)
+        if pool is not None:
+            self._interned = pool.intern_records(record['items'])
 
         members = {}
         for member in record['items']:
+            if self._columns is not None:
+                member = dict([(k, member[k]) for k in self._columns
+                               if k in member])
             members[member[self._identifier]] = Member(osm, section, accessor, column_map, member)
 
         OSMObject.__init__(self, osm, accessor, members)
 
+        self._derived = {}
+
+    def _reverse_column_map(self):
+        """Return a dict of friendly column name -> raw column."""
+        return dict([(v.replace(' ', ''), k)
+                     for k, v in self._column_map.items()])
+
+    def _project(self, columns):
+        """Return the set of raw column names to keep, or None for all.
+
+        columns may name raw or friendly columns; the identifier is
+        always kept.
+        """
+        if columns is None:
+            return None
+
+        reverse = self._reverse_column_map()
+        keep = set([reverse.get(column.replace(' ', ''), column)
+                    for column in columns])
+        keep.add(self._identifier)
+        return keep
+
+    # Members are requested with dateFormat=uk. These raw columns hold
+    # dates in DATE_FORMAT, so they are the ones dates() will parse.
+    DATE_FIELDS = ('dob', 'started', 'joined', 'startedsection')
+    DATE_FORMAT = UK_DATE
+
+    @classmethod
+    def check_date_field(cls, column):
+        if column not in cls.DATE_FIELDS:
+            raise ValueError("{0!r} is not a date column; date columns "
+                             "are {1}".format(column,
+                                              ', '.join(cls.DATE_FIELDS)))
+
+    def column(self, key):
+        """Return a dict of identifier -> value of one column.
+
+        key may be a raw or a friendly column name.
+        """
+        ret = {}
+        for identifier, member in self._record.items():
+            try:
+                ret[identifier] = member[key]
+            except KeyError:
+                ret[identifier] = None
+        return ret
+
+    def dates(self, key):
+        """Return a dict of identifier -> datetime (or None) for a column.
+
+        Raises ValueError if key is not one of DATE_FIELDS.
+        """
+        self.check_date_field(
+            self._reverse_column_map().get(key.replace(' ', ''), key))
+
+        column = self.column(key)
+        return dict(zip(column.keys(),
+                        parse_dates(column.values(), self.DATE_FORMAT)))
+
+    def ages(self, date=None):
+        """Return a dict of identifier -> (years, months) age on date.
+
+        date defaults to today. Ages are worked out once per date and
+        kept; call clear_derived() after changing dates of birth.
+        """
+        date = _as_datetime(date) or datetime.datetime.combine(
+            datetime.date.today(), datetime.time())
+
+        try:
+            return self._derived[('ages', date)]
+        except KeyError:
+            pass
+
+        by_dob = {}
+        ret = {}
+        for identifier, dob in self.dates('dob').items():
+            if dob is None:
+                ret[identifier] = None
+                continue
+            try:
+                ret[identifier] = by_dob[dob]
+            except KeyError:
+                ret[identifier] = by_dob[dob] = age_at(dob, date)
+
+        self._derived[('ages', date)] = ret
+        return ret
+
+    def clear_derived(self):
+        self._derived = {}
+
+    def memory_report(self):
+        """Report the memory held by the member records.
+
+        'records' is the size of the dicts themselves, 'values' the
+        size of their keys and values counting shared objects once,
+        'unshared' what the keys and values would take if no object
+        were shared, and 'interned' the bytes saved by the value pool
+        when the records were decoded.
+        """
+        records = [member._record for member in self._record.values()]
+        shared, unshared = _sizeof_records(records)
+        return {'members': len(records),
+                'records': sum([sys.getsizeof(r) for r in records]),
+                'values': shared,
+                'unshared': unshared,
+                'interned': self._interned}
+
     def new_member(self, firstname, lastname, dob, startedsection, started):
         new_member = Member(self._osm, self._section,
-                            self._accessor,self._column_map,self.DEFAULT_DICT)
+                            self._accessor,self._column_map,dict(self.DEFAULT_DICT))
         new_member['firstname'] = firstname
         new_member['lastname'] = lastname
         new_member['dob'] = dob
@@ -460,26 +2106,38 @@ class Members(OSMObject):
         return new_member
 
 class Section(OSMObject):
-    def __init__(self, osm, accessor, record):
+    @_profiled('Section.__init__')
+    def __init__(self, osm, accessor, record, member_columns=None,
+                 term_index=None, refresh=False):
         OSMObject.__init__(self, osm, accessor, record)
 
+        # _lock guards edits to the section's members; _refresh_lock
+        # stops two refreshes running at once. Readers take neither.
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+
+        if term_index is None:
+            term_index = osm.term_index
+
+        # The member columns kept by default; None keeps them all.
+        self.member_columns = member_columns
+
         try:
             self._member_column_map = record['sectionConfig']['columnNames']
         except KeyError:
             log.debug("No extra member columns.")
             self._member_column_map = {}
 
-        self.terms = [term for term in osm.terms(self['sectionid'])
-                      if term.is_active()]
+        self._registers = {}
 
-        # TODO - report error if terms has more than one entry.
-        self.term = self.terms[0]
+        self.terms = term_index.active(self['sectionid'])
+        self.term = term_index.current(self['sectionid'])
 
-        self.challenge = self._get_badges('challenge')
-        self.activity = self._get_badges('activity')
-        self.staged = self._get_badges('staged')
-        self.core = self._get_badges('core')
-        self.members = self._get_members()
+        self.challenge = self._get_badges('challenge', refresh)
+        self.activity = self._get_badges('activity', refresh)
+        self.staged = self._get_badges('staged', refresh)
+        self.core = self._get_badges('core', refresh)
+        self.members = self._get_members(refresh)
 
     def __repr__(self):
         return 'Section({0}, "{1}", "{2}")'.format(
@@ -487,79 +2145,623 @@ class Section(OSMObject):
             self['sectionname'],
             self['section'])
 
-    def _get_badges(self, badge_type):
-        url = "challenges.php?action=getInitialBadges" \
-              "&type={0}" \
-              "&sectionid={1}" \
-              "&section={2}" \
-              "&termid={3}" \
+    BADGE_TYPES = ('challenge', 'activity', 'staged', 'core')
+
+    @staticmethod
+    def badges_query(sectionid, section, termid, badge_type):
+        return "challenges.php?action=getInitialBadges" \
+               "&type={0}" \
+               "&sectionid={1}" \
+               "&section={2}" \
+               "&termid={3}" \
             .format(badge_type, 
-                    self['sectionid'],
-                    self['section'],
-                    self.term['termid'])
+                    sectionid,
+                    section,
+                    termid)
+
+    @staticmethod
+    def members_query(sectionid, section, termid):
+        return "users.php?&action=getUserDetails" \
+               "&sectionid={0}" \
+               "&termid={1}" \
+               "&dateFormat=uk" \
+               "&section={2}" \
+            .format(sectionid,
+                    termid,
+                    section)
+
+    def _get_badges(self, badge_type, refresh=False):
+        url = self.badges_query(self['sectionid'], self['section'],
+                                self.term['termid'], badge_type)
 
         return Badges(self._osm, self._accessor,
-                      self._accessor(url), self, badge_type)
-
-    def events(self):
-        pass
+                      self._accessor(url, refresh=refresh), self, badge_type)
+
+    def refresh(self, badges=True, members=True):
+        """Fetch the section's badges and members again.
+
+        Each new Badges and Members is built in full and then swapped
+        in with a single assignment, so a reader sees either the old
+        or the new object and never waits for the refresh. Unsaved
+        edits to the old Member objects are not carried over.
+        """
+        with self._refresh_lock:
+            if badges:
+                for badge_type in self.BADGE_TYPES:
+                    setattr(self, badge_type,
+                            self._get_badges(badge_type, refresh=True))
+            if members:
+                self.members = self._get_members(refresh=True)
+                for listener in self._osm.listeners:
+                    listener(self, None, None)
+
+    def events(self, start=None, end=None):
+        """Generate the section's events, optionally within a date range.
+
+        Events are fetched one term at a time, and only for the terms
+        that overlap the range, so a page is not requested until the
+        caller has consumed the events before it. Events without a
+        start date are only included when no range is given.
+        """
+        start = _as_datetime(start)
+        end = _as_datetime(end)
+
+        # Overlapping terms can return the same event twice.
+        seen = set()
+
+        for term in self._osm.term_index.terms(self['sectionid']):
+            if start is not None and term.enddate < start:
+                continue
+            if end is not None and term.startdate > end:
+                continue
+
+            url = "events.php?action=getEvents" \
+                  "&sectionid={0}" \
+                  "&termid={1}" \
+                .format(self['sectionid'], term['termid'])
+
+            for record in self._accessor(url).get('items', []):
+                if record['eventid'] in seen:
+                    continue
+                seen.add(record['eventid'])
+
+                event = Event(self._osm, self._accessor, self, term, record)
+                if start is not None or end is not None:
+                    if event.startdate is None:
+                        continue
+                    if start is not None and event.startdate < start:
+                        continue
+                    if end is not None and event.startdate > end:
+                        continue
+                yield event
+
+    def register(self, term=None):
+        """Return the attendance Register for a term (default current).
+
+        The register is requested once per term and kept on the
+        section; use Register.refresh() to pick up new meetings.
+        """
+        if term is None:
+            term = self.term
 
-    def _get_members(self):
-        url = "users.php?&action=getUserDetails" \
-              "&sectionid={0}" \
-              "&termid={1}" \
-              "&dateFormat=uk" \
-              "&section={2}" \
-            .format(self['sectionid'],
-                    self.term['termid'],
-                    self['section'])
+        try:
+            return self._registers[term['termid']]
+        except KeyError:
+            pass
+
+        register = Register(self._osm, self._accessor, self, term)
+        self._registers[term['termid']] = register
+        return register
+
+    def fetch_attendance(self, events, workers=4):
+        """Fetch the attendance of several events concurrently.
+
+        Returns a dict of eventid -> list of attendee records.
+        """
+        ret = {}
+        for event, attendance, error in _fetch_concurrently(
+                lambda event: event.attendance(), events, workers):
+            if error is not None:
+                raise error
+            ret[event['eventid']] = attendance
+        return ret
 
+    def _get_members(self, refresh=False):
+        return self.get_members(self.member_columns, refresh)
+
+    def get_members(self, columns=None, refresh=False):
+        """Return the section's Members, keeping only columns if given.
+
+        columns may be raw or friendly column names. When a projection
+        is asked for, the projected records are cached (under the
+        request plus the columns) in place of the full getUserDetails
+        response, so only the projected values stay in memory and are
+        saved with the cache.
+        """
+        url = self.members_query(self['sectionid'], self['section'],
+                                 self.term['termid'])
+
+        if columns is None:
+            return Members(self._osm, self, self._accessor,
+                           self._member_column_map,
+                           self._accessor(url, refresh=refresh))
+
+        def project(record):
+            members = Members(self._osm, self, self._accessor,
+                              self._member_column_map, record, columns)
+            return {'identifier': members._identifier,
+                    'items': [member._record for member in members.values()]}
+
+        record = self._accessor.derived(
+            url, 'columns=' + ','.join(sorted(columns)), project, refresh)
         return Members(self._osm, self, self._accessor,
-                       self._member_column_map, self._accessor(url))
+                       self._member_column_map, record, columns)
+
+
+class Prefetcher(object):
+    """Warm the Accessor cache ahead of OSM object construction.
+
+    As soon as getUserRoles has returned, OSM hands the roles to the
+    prefetcher which queues the requests Section construction will make
+    (getTerms, the four getInitialBadges types and getUserDetails) on a
+    pool of background threads. With depth=2 each badge's member list
+    is fetched as well.
+
+    Requests are taken in priority order, lowest first; priorities
+    maps a request kind ('terms', 'badges', 'members' or
+    'badge_members') to its priority. The Accessor makes sure that a
+    request already being prefetched is not fetched twice.
+    """
+
+    PRIORITIES = {'terms': 0,
+                  'members': 1,
+                  'badges': 2,
+                  'badge_members': 3}
+
+    def __init__(self, depth=1, workers=4, priorities=None):
+        self.depth = depth
+        self.workers = workers
+        self.priorities = dict(self.PRIORITIES)
+        if priorities:
+            self.priorities.update(priorities)
+
+        self._queue = Queue.PriorityQueue()
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def _put(self, kind, query, then=None):
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+        self._queue.put((self.priorities[kind], seq, query, then))
+
+    def _run(self, accessor):
+        while True:
+            priority, seq, query, then = self._queue.get()
+            try:
+                if query is None:
+                    return
+                result = accessor(query)
+                if then is not None:
+                    then(result)
+            except Exception as e:
+                log.debug("Prefetch of {0} failed: {1}".format(query, e))
+            finally:
+                self._queue.task_done()
+
+    def start(self, accessor, roles, term_policy=None, sectionids=None):
+        """Queue the follow-on requests for each section in roles."""
+        roles = [role for role in roles
+                 if 'section' in role and
+                 (sectionids is None or role['sectionid'] in sectionids)]
+
+        def terms_fetched(terms):
+            index = TermIndex(None, accessor, terms,
+                              term_policy or TermIndex.LATEST)
+            for role in roles:
+                try:
+                    termid = index.current(role['sectionid'])['termid']
+                except TermError:
+                    continue
+                self._queue_section(role, termid)
+
+        self._put('terms', 'api.php?action=getTerms', terms_fetched)
+
+        if not self._threads:
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, args=(accessor,))
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+
+    def _queue_section(self, role, termid):
+        sectionid = role['sectionid']
+        section = role['section']
+
+        self._put('members',
+                  Section.members_query(sectionid, section, termid))
+
+        for badge_type in Section.BADGE_TYPES:
+            then = None
+            if self.depth > 1:
+                then = self._badges_fetched(sectionid, section, termid,
+                                            badge_type)
+            self._put('badges',
+                      Section.badges_query(sectionid, section, termid,
+                                           badge_type),
+                      then)
+
+    def _badges_fetched(self, sectionid, section, termid, badge_type):
+        def then(badges):
+            for details in badges['details'].values():
+                self._put('badge_members',
+                          Badge.members_query(termid, badge_type, sectionid,
+                                              section, details['name']))
+        return then
+
+    def wait(self):
+        """Block until everything queued so far has been fetched."""
+        self._queue.join()
+
+    def close(self):
+        """Stop the worker threads once the queue is drained."""
+        for thread in self._threads:
+            self._queue.put((sys.maxint, sys.maxint, None, None))
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+
+class RefreshScheduler(object):
+    """Refresh sections' members and badges in the background.
+
+    Each registered (sectionid, endpoint) is refreshed every interval
+    seconds, give or take jitter (a fraction of the interval), using
+    Section.refresh() so readers see the old data until the new has
+    been built. endpoint is 'members' or 'badges'.
+
+    budget caps the requests the scheduler makes a minute across all
+    its jobs (None for no cap); a job that would exceed it is held
+    back until enough budget has built up, which shows as lag.
+    """
+
+    # Requests each kind of refresh makes.
+    COST = {'members': 1, 'badges': len(Section.BADGE_TYPES)}
+
+    def __init__(self, osm, budget=None):
+        self._osm = osm
+        self.budget = budget
+
+        self._jobs = []
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self._tokens = float(budget or 0)
+        self._tokens_at = time.time()
+
+        # (sectionid, endpoint) -> dict of 'last', 'lag', 'runs', 'error'
+        self.status = {}
+
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def register(self, sectionid, endpoint, interval, jitter=0.1):
+        if endpoint not in self.COST:
+            raise ValueError("Unknown endpoint {0!r}".format(endpoint))
+
+        with self._cond:
+            self.status[(sectionid, endpoint)] = {'last': None, 'lag': 0.0,
+                                                  'runs': 0, 'error': None}
+            self._schedule(time.time() + self._next(interval, jitter),
+                           (sectionid, endpoint, interval, jitter))
+            self._cond.notify()
+
+    def _next(self, interval, jitter):
+        return interval * (1 + random.uniform(-jitter, jitter))
+
+    def _schedule(self, due, job):
+        self._seq += 1
+        heapq.heappush(self._jobs, (due, self._seq, job))
+
+    def _take_budget(self, cost):
+        """Spend cost requests of budget; returns seconds to wait if short."""
+        if self.budget is None:
+            return 0
+
+        now = time.time()
+        per_second = self.budget / 60.0
+        self._tokens = min(float(self.budget),
+                           self._tokens + (now - self._tokens_at) * per_second)
+        self._tokens_at = now
+
+        if self._tokens >= cost:
+            self._tokens -= cost
+            return 0
+        return (cost - self._tokens) / per_second
+
+    def lag(self):
+        """Return a dict of (sectionid, endpoint) -> seconds since refresh."""
+        now = time.time()
+        with self._cond:
+            return dict([(job, now - status['last']
+                          if status['last'] is not None else None)
+                         for job, status in self.status.items()])
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed:
+                    if self._jobs:
+                        due, seq, job = self._jobs[0]
+                        wait = due - time.time()
+                        if wait <= 0:
+                            wait = self._take_budget(self.COST[job[1]])
+                            if wait <= 0:
+                                heapq.heappop(self._jobs)
+                                break
+                    else:
+                        wait = None
+                    self._cond.wait(wait)
+
+                if self._closed:
+                    return
+
+            sectionid, endpoint, interval, jitter = job
+            start = time.time()
+            error = None
+            try:
+                section = self._osm.sections[sectionid]
+                section.refresh(badges=(endpoint == 'badges'),
+                                members=(endpoint == 'members'))
+            except Exception as e:
+                log.warning("Refresh of {0} {1} failed: {2}".format(
+                    sectionid, endpoint, e))
+                error = e
+
+            with self._cond:
+                status = self.status[(sectionid, endpoint)]
+                status['lag'] = start - due
+                status['runs'] += 1
+                status['error'] = error
+                if error is None:
+                    status['last'] = time.time()
+                self._schedule(due + self._next(interval, jitter), job)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+
+# What OSM publishes after each build: readers that need the sections
+# and the term index to agree take OSM.state once and use its fields.
+OSMState = collections.namedtuple('OSMState', 'term_index sections section')
 
 
 class OSM(object):
-    def __init__(self, authorisor):
+    def __init__(self, authorisor, term_policy=TermIndex.LATEST,
+                 sectionids=None, prefetch=None, member_columns=None,
+                 intern_values=True):
         self._accessor = Accessor(authorisor)
-
-        self.sections = {}
-        self.section = None
+        self.value_pool = ValuePool() if intern_values else None
+        self._member_columns = member_columns
+        self._term_policy = term_policy
+        self._sectionids = sectionids
+        self.prefetch = prefetch
+
+        self.state = OSMState(None, {}, None)
+        self._publish_lock = threading.Lock()
+        self.write_behind = None
+        self.scheduler = None
+
+        # Callables called as listener(section, member, key) after a
+        # member is edited. member is None when all of a section's
+        # members were replaced, and section is None too when every
+        # section was.
+        self.listeners = []
 
         self.init()
 
     def init(self):
-        roles = self._accessor('api.php?action=getUserRoles')
+        self._publish(*self._build())
+
+    def refresh(self):
+        """Fetch the roles, terms and every section again.
+
+        The new sections are built in full and then swapped in
+        together, so readers of the old ones are never blocked and
+        never see a partly built section.
+        """
+        self._publish(*self._build(refresh=True))
+
+        for listener in self.listeners:
+            listener(None, None, None)
+
+    @_profiled('OSM._build')
+    def _build(self, refresh=False):
+        roles = self._accessor('api.php?action=getUserRoles',
+                               refresh=refresh)
 
-        self.sections = {}
+        if self.prefetch is not None and not refresh:
+            self.prefetch.start(self._accessor, roles, self._term_policy,
+                                self._sectionids)
 
-        for section in [Section(self, self._accessor, role)
+        term_index = TermIndex(self, self._accessor,
+                               self._accessor('api.php?action=getTerms',
+                                              refresh=refresh),
+                               self._term_policy)
+
+        sections = {}
+        default = None
+
+        for section in [Section(self, self._accessor, role,
+                                self._member_columns, term_index, refresh)
                         for role in roles
-                        if 'section' in role]:
-            self.sections[section['sectionid']] = section
+                        if 'section' in role and
+                        (self._sectionids is None or
+                         role['sectionid'] in self._sectionids)]:
+            sections[section['sectionid']] = section
             if section['isDefault'] == u'1':
-                self.section = section
+                default = section
 
-        log.info("Default section = {0}, term = {1}".format(
-            self.section['sectionname'],
-            self.section.term['name']))
+        if default is None and sections:
+            # The default section was not one of those requested.
+            default = sections.values()[0]
 
-    def terms(self, sectionid):
-        return [Term(self, self._accessor, term) for term \
-                in self._accessor('api.php?action=getTerms')[sectionid]]
+        return term_index, sections, default
 
+    def _publish(self, term_index, sections, section):
+        # One assignment, so no reader sees the new term index with
+        # the old sections.
+        with self._publish_lock:
+            self.state = OSMState(term_index, sections, section)
 
-if __name__ == '__main__':
+        if section is not None:
+            log.info("Default section = {0}, term = {1}".format(
+                section['sectionname'],
+                section.term['name']))
+
+    def _replace_state(self, **fields):
+        with self._publish_lock:
+            self.state = self.state._replace(**fields)
+
+    @property
+    def term_index(self):
+        return self.state.term_index
+
+    @term_index.setter
+    def term_index(self, term_index):
+        self._replace_state(term_index=term_index)
+
+    @property
+    def sections(self):
+        return self.state.sections
+
+    @sections.setter
+    def sections(self, sections):
+        self._replace_state(sections=sections)
+
+    @property
+    def section(self):
+        return self.state.section
+
+    @section.setter
+    def section(self, section):
+        self._replace_state(section=section)
+
+    def terms(self, sectionid):
+        return self.term_index.terms(sectionid)
+
+    def memory_report(self):
+        """Report the memory held by this OSM and the Accessor cache.
+
+        Returns a dict with, for each section, the bytes and object
+        counts of its Members, each Badges type, its terms, registers
+        and the Section itself; the same for each cache entry (by
+        canonical request) and the term index; the counts of every
+        object type seen; and the totals. An object reachable from
+        more than one place is counted once, against the first owner
+        in that order, so a cache entry only shows what is not already
+        held by the sections.
+        """
+        state = self.state
+        sizer = _Sizer([self, self._accessor, self._accessor._auth,
+                        self.write_behind, self.prefetch, self.value_pool] +
+                       self.listeners + state.sections.values())
+
+        def measure(*objs):
+            size, count = sizer.walk(*objs)
+            return {'bytes': size, 'objects': count}
+
+        sections = {}
+        for sectionid, section in state.sections.items():
+            report = {}
+            report['Members'] = measure(section.members)
+            for badge_type in Section.BADGE_TYPES:
+                report['Badges.' + badge_type] = measure(
+                    getattr(section, badge_type))
+            report['Term'] = measure(section.terms, section.term)
+            report['Register'] = measure(section._registers)
+            sizer.release(section)
+            report['Section'] = measure(section)
+            sections[sectionid] = report
+
+        term_index = measure(state.term_index)
+
+        cache = {}
+        entries, keys = Accessor.__cache_snapshot__()
+        for key, entry in entries.items():
+            cache[keys.get(key, key)] = measure(entry)
+
+        total = {'bytes': 0, 'objects': 0}
+        for report in sections.values() + [cache]:
+            for item in report.values():
+                total['bytes'] += item['bytes']
+                total['objects'] += item['objects']
+        total['bytes'] += term_index['bytes']
+        total['objects'] += term_index['objects']
+
+        return {'sections': sections,
+                'term_index': term_index,
+                'cache': cache,
+                'types': dict(sizer.types),
+                'total': total}
+
+    def enable_write_behind(self, interval=5.0, max_pending=50):
+        """Queue Member.save() calls to a background WriteBehind."""
+        if self.write_behind is None:
+            self.write_behind = WriteBehind(interval, max_pending)
+        return self.write_behind
+
+    def schedule_refresh(self, sectionid, endpoint, interval, jitter=0.1,
+                         budget=None):
+        """Refresh a section's 'members' or 'badges' every interval seconds.
+
+        budget, the most requests a minute for all scheduled refreshes,
+        is only used when the first refresh is scheduled.
+        """
+        if self.scheduler is None:
+            self.scheduler = RefreshScheduler(self, budget)
+        self.scheduler.register(sectionid, endpoint, interval, jitter)
+        return self.scheduler
+
+    def close(self):
+        """Stop any write-behind queue, prefetcher and refresh scheduler."""
+        if self.scheduler is not None:
+            self.scheduler.close()
+            self.scheduler = None
+        if self.write_behind is not None:
+            self.write_behind.close()
+            self.write_behind = None
+        if self.prefetch is not None:
+            self.prefetch.close()
+
+
+def main(argv=None):
+    # docopt exits here for --help and --version, before anything else
+    # is loaded.
+    from docopt import docopt
+    args = docopt(__doc__, argv=argv, version='OSM 2.0')
 
     logging.basicConfig(level=logging.DEBUG)
     log.debug("Debug On\n")
+    print args
 
-    try:
-        Accessor.__cache_load__(open(DEF_CACHE, 'r'))
-    except:
-        log.debug("Failed to load cache file\n")
+    # The cache is loaded by the first request that needs it.
+    Accessor.CACHE_FILE = DEF_CACHE
+
+    if args['--compress']:
+        Accessor.use_compression(args['--compress'])
+
+    profiler = None
+    if args['--profile']:
+        profiler = Profiler()
+        set_profiler(profiler)
 
-    args = docopt(__doc__, version='OSM 2.0')
-    print args
     if args['-a']:
         auth = Authorisor(args['<apiid>'], args['<token>'])
         auth.authorise(args['<email>'],
@@ -573,17 +2775,24 @@ if __name__ == '__main__':
     if args['run']:
         accessor = Accessor(auth)
 
-        pp.pprint(accessor(args['<query>']))
+        print _pformat(accessor(args['<query>']))
 
+        _finish(profiler, args['--profile'])
+        return
 
     osm = OSM(auth)
 
     log.debug('Sections - {0}\n'.format(osm.sections))
 
+    if args['--memory']:
+        print _pformat(osm.memory_report())
+        print _pformat(Accessor.compression_report())
+
 
     test_section = '15797'
-    for badge in osm.sections[test_section].challenge.values():
-        log.debug('{0}'.format(badge._record))
+    if test_section in osm.sections:
+        for badge in osm.sections[test_section].challenge.values():
+            log.debug('{0}'.format(badge._record))
               
     #members = osm.sections[test_section].members
 
@@ -610,4 +2819,18 @@ if __name__ == '__main__':
     #    log.debug("{0}: {1}".format(k,v.keys()))
 
 
-    Accessor.__cache_save__(open(DEF_CACHE, 'w'))
+    _finish(profiler, args['--profile'])
+
+
+def _finish(profiler, profile_file):
+    if profiler is not None:
+        profiler.write(profile_file)
+
+    # A cache that was never loaded has nothing new to save, and saving
+    # it would overwrite the file with an empty one.
+    if Accessor._cache_loaded:
+        Accessor.__cache_save__(open(DEF_CACHE, 'w'))
+
+
+if __name__ == '__main__':
+    main()
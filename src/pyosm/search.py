@@ -0,0 +1,278 @@
+# coding=utf-8
+"""Fuzzy member search across every section of an OSM.
+
+MemberSearch indexes the trigrams of each member's names (and
+optionally their email addresses and phone numbers) in posting lists.
+A query is split into trigrams too and the members sharing any of
+them are counted from the posting lists. Members are ranked by the
+fraction of the query's trigrams they contain, then by Dice
+similarity. Misspelt names still match, and only members that share
+something with the query are ever looked at.
+
+    search = MemberSearch(osm)
+    for member, score in search('jonh smth'):
+        ...
+
+The index registers itself as an OSM listener and keeps up to date as
+members are edited or sections refreshed. Listeners may be called from
+background threads while queries run, so changes to the index are made
+under a lock, and a rebuild is built to one side and swapped in.
+"""
+
+import re
+import math
+import heapq
+import itertools
+import threading
+import unicodedata
+import collections
+
+NAME_FIELDS = ('firstname', 'lastname')
+CONTACT_FIELDS = ('email1', 'email2', 'email3', 'email4',
+                  'phone1', 'phone2', 'phone3', 'phone4')
+
+_NONE = frozenset()
+
+_WORD = re.compile(r'[a-z0-9@.]+')
+_DIGIT_GAP = re.compile(r'(?<=\d)[\s-]+(?=\d)')
+
+
+def normalise(text):
+    """Lower case text and strip accents and punctuation."""
+    if not isinstance(text, unicode):
+        text = unicode(text or '', 'utf-8', 'replace')
+    text = unicodedata.normalize('NFKD', text)
+    text = u''.join([c for c in text if not unicodedata.combining(c)])
+    return text.lower()
+
+
+def trigrams(text):
+    """Return the set of trigrams of each word in text.
+
+    Words are padded so that short words and word starts still give
+    distinctive trigrams.
+    """
+    # Phone numbers are matched on their digits, ignoring spacing.
+    text = _DIGIT_GAP.sub('', normalise(text))
+
+    grams = set()
+    for word in _WORD.findall(text):
+        word = '  ' + word + ' '
+        grams.update([word[i:i + 3] for i in range(len(word) - 2)])
+    return grams
+
+
+class MemberSearch(object):
+    """A trigram index over the members of every section of an OSM."""
+
+    def __init__(self, osm, contact=False):
+        self._osm = osm
+        self.fields = NAME_FIELDS + (CONTACT_FIELDS if contact else ())
+
+        # Guards _postings, _docs and _ids. Trigrams are worked out
+        # before it is taken, so it is only held to update or read the
+        # index. Each (sectionid, scoutid) doc is given a number, which
+        # is what the posting lists hold, as numbers hash faster than
+        # tuples in the set operations of a query.
+        self._lock = threading.RLock()
+        self._postings = collections.defaultdict(set)
+        self._docs = {}
+        self._ids = {}
+        self._numbers = itertools.count()
+
+        self.rebuild()
+        osm.listeners.append(self._changed)
+
+    def close(self):
+        """Stop following changes to the OSM."""
+        self._osm.listeners.remove(self._changed)
+
+    def __len__(self):
+        return len(self._docs)
+
+    def _text(self, member):
+        values = []
+        for field in self.fields:
+            try:
+                value = member[field]
+            except KeyError:
+                continue
+            values.append(unicode(value or ''))
+        return u' '.join(values)
+
+    def _entry(self, section, member):
+        """Return (doc, member, trigrams) for member, or None."""
+        if not member['scoutid']:
+            # Not saved yet, so nothing to identify it by.
+            return None
+        return ((section['sectionid'], member['scoutid']), member,
+                trigrams(self._text(member)))
+
+    def _entries(self, section):
+        return [entry for entry in [self._entry(section, member)
+                                    for member in section.members.values()]
+                if entry is not None]
+
+    def rebuild(self):
+        """Index every member of every section from scratch."""
+        postings = collections.defaultdict(set)
+        docs = {}
+        ids = {}
+        for section in self._osm.sections.values():
+            for doc, member, grams in self._entries(section):
+                number = ids.get(doc)
+                if number is None:
+                    number = ids[doc] = next(self._numbers)
+                docs[number] = (doc, member, grams)
+                for gram in grams:
+                    postings[gram].add(number)
+
+        with self._lock:
+            self._postings = postings
+            self._docs = docs
+            self._ids = ids
+
+    def add_section(self, section):
+        entries = self._entries(section)
+        with self._lock:
+            for entry in entries:
+                self._insert(*entry)
+
+    def remove_section(self, sectionid):
+        with self._lock:
+            for doc in [doc for doc in self._ids if doc[0] == sectionid]:
+                self.remove(doc)
+
+    def _replace_section(self, section):
+        entries = self._entries(section)
+        with self._lock:
+            self.remove_section(section['sectionid'])
+            for entry in entries:
+                self._insert(*entry)
+
+    def add(self, section, member):
+        """Index member, replacing any earlier entry for it."""
+        entry = self._entry(section, member)
+        if entry is not None:
+            with self._lock:
+                self._insert(*entry)
+
+    def _insert(self, doc, member, grams):
+        self.remove(doc)
+        number = self._ids[doc] = next(self._numbers)
+        self._docs[number] = (doc, member, grams)
+        for gram in grams:
+            self._postings[gram].add(number)
+
+    def remove(self, doc):
+        """Remove the (sectionid, scoutid) entry doc from the index."""
+        with self._lock:
+            try:
+                number = self._ids.pop(doc)
+            except KeyError:
+                return
+            doc, member, grams = self._docs.pop(number)
+            for gram in grams:
+                postings = self._postings[gram]
+                postings.discard(number)
+                if not postings:
+                    del self._postings[gram]
+
+    def _changed(self, section, member, key):
+        if section is None:
+            self.rebuild()
+        elif member is None:
+            self._replace_section(section)
+        elif key in self.fields:
+            self.add(section, member)
+
+    @staticmethod
+    def _count(docs, postings):
+        """Split docs by how many of the posting lists each is in.
+
+        Returns a list whose item c is the set of docs in exactly c of
+        the lists. Only set operations are used, so the counting is
+        done in C rather than a doc at a time.
+        """
+        levels = [set(docs)]
+        for docs in postings:
+            if not docs:
+                continue
+            for c in range(len(levels) - 1, -1, -1):
+                moved = levels[c] & docs
+                if moved:
+                    levels[c] -= moved
+                    if c + 1 == len(levels):
+                        levels.append(moved)
+                    else:
+                        levels[c + 1] |= moved
+        return levels
+
+    def __call__(self, query, limit=10, min_score=0.25):
+        """Return up to limit (member, score) pairs, best first.
+
+        score is the fraction of the query's trigrams found in the
+        member, from 0 to 1. Members with equal scores are ordered by
+        the Dice similarity of their trigrams to the query's, which
+        favours closer, shorter matches.
+
+        The query's posting lists are read shortest first. A member
+        with at least need of the query's n trigrams is in one of the
+        first n - need + 1 lists, so once limit members with need
+        trigrams have been found the longer lists, those of the most
+        common trigrams, add no candidates and are only intersected
+        with the candidates already found. If limit members have every
+        trigram, nothing else is counted at all.
+        """
+        grams = trigrams(query)
+        if not grams:
+            return []
+
+        total = len(grams)
+        floor = max(1, int(math.ceil(min_score * total - 1e-9)))
+
+        with self._lock:
+            postings = sorted([self._postings.get(gram, _NONE)
+                               for gram in grams], key=len)
+
+            levels = [set() for c in range(total + 1)]
+            levels[total] = self._intersection(postings)
+            if len(levels[total]) < limit:
+                seen = set()
+                for i, docs in enumerate(postings):
+                    # The docs first seen in list i are in none of the
+                    # lists before it.
+                    new = set(docs) - seen if seen else docs
+                    if new:
+                        seen.update(new)
+                        counted = self._count(new, postings[i + 1:])
+                        for c, found in enumerate(counted):
+                            levels[c + 1] |= found
+
+                    need = total - i
+                    if need <= floor or \
+                            sum([len(found) for found in levels[need:]]) >= limit:
+                        break
+
+            ret = []
+            for common in range(total, floor - 1, -1):
+                if len(ret) >= limit:
+                    break
+                scored = [(2.0 * common / (total + len(doc_grams)), doc, member)
+                          for doc, member, doc_grams in
+                          [self._docs[number] for number in levels[common]]]
+                for dice, doc, member in heapq.nlargest(limit - len(ret),
+                                                        scored):
+                    ret.append((member, float(common) / total))
+
+        return ret
+
+    @staticmethod
+    def _intersection(postings):
+        """Return the docs in every one of postings, shortest first."""
+        docs = set(postings[0])
+        for other in postings[1:]:
+            if not docs:
+                break
+            docs &= other
+        return docs
@@ -0,0 +1,258 @@
+# coding=utf-8
+"""Read-only, memory-mapped snapshots of a section's members.
+
+export_members() writes a section's Members to a fixed-layout file
+which any number of processes can open with MemberSnapshot. The file
+is mapped rather than read, so the pages are shared between the
+processes and each one only pays for the values it actually touches.
+
+Layout (little-endian, arrays aligned to 8 bytes):
+
+  header   magic, version, nrows, nstrings, length of the schema
+  schema   JSON: identifier, column names and types, column map
+  strings  uint32 offsets[nstrings + 1] followed by the utf-8 text
+  index    uint32 rows[nrows], ordered by identifier
+  columns  one array of nrows per column; 'q' columns hold int64
+           values, 's' and 'j' columns hold uint32 string numbers
+           ('j' strings are JSON encoded values)
+
+A string number of 0xFFFFFFFF stands for None.
+"""
+
+import os
+import json
+import mmap
+import struct
+import collections
+
+MAGIC = 'PYOSMSN1'
+VERSION = 1
+
+HEADER = struct.Struct('<8sIIII')
+NONE = 0xFFFFFFFF
+
+
+def _pad(n):
+    return (n + 7) & ~7
+
+
+def _pack(kind, values):
+    if kind != 'q':
+        kind = 'I'
+    return struct.pack('<{0}{1}'.format(len(values), kind), *values)
+
+
+def _column_type(values):
+    if all([isinstance(v, (int, long)) and not isinstance(v, bool)
+            for v in values]):
+        return 'q'
+    if all([v is None or isinstance(v, basestring) for v in values]):
+        return 's'
+    return 'j'
+
+
+def export_members(members, path):
+    """Write Members (or a Section's members) to a snapshot at path.
+
+    The file is written alongside path and renamed into place, so
+    readers never see a partly written snapshot.
+    """
+    members = getattr(members, 'members', members)
+
+    records = [member._record for member in members.values()]
+    names = sorted(set([key for record in records for key in record]))
+
+    strings = {}
+    table = []
+
+    def string(value):
+        if value is None:
+            return NONE
+        try:
+            return strings[value]
+        except KeyError:
+            strings[value] = len(table)
+            table.append(value)
+            return strings[value]
+
+    columns = []
+    for name in names:
+        values = [record.get(name) for record in records]
+        kind = _column_type(values)
+        if kind == 's':
+            values = [string(v) for v in values]
+        elif kind == 'j':
+            values = [string(json.dumps(v)) for v in values]
+        columns.append((name, kind, _pack(kind, values)))
+
+    identifier = members._identifier
+    ids = [unicode(record.get(identifier, u'')) for record in records]
+    index = sorted(range(len(records)), key=lambda row: ids[row])
+
+    schema = json.dumps({'identifier': identifier,
+                         'columns': [[name, kind]
+                                     for name, kind, data in columns],
+                         'column_map': members._column_map})
+
+    blob = [value.encode('utf-8') if isinstance(value, unicode)
+            else value for value in table]
+    offsets = [0]
+    for text in blob:
+        offsets.append(offsets[-1] + len(text))
+
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as out:
+        def write_aligned(data):
+            out.write(data)
+            out.write('\0' * (_pad(out.tell()) - out.tell()))
+
+        write_aligned(HEADER.pack(MAGIC, VERSION, len(records), len(table),
+                                  len(schema)) + schema)
+        write_aligned(_pack('I', offsets) + ''.join(blob))
+        write_aligned(_pack('I', index))
+        for name, kind, data in columns:
+            write_aligned(data)
+
+    os.rename(tmp, path)
+
+
+class SnapshotMember(collections.Mapping):
+    """A read-only, dict-like view of one member in a snapshot."""
+
+    def __init__(self, snapshot, row):
+        self._snapshot = snapshot
+        self._row = row
+
+    def __getattr__(self, key):
+        try:
+            return self[key]
+        except KeyError:
+            raise AttributeError("%r object has no attribute %r" %
+                                 (type(self).__name__, key))
+
+    def __getitem__(self, key):
+        return self._snapshot._value(self._row, key)
+
+    def __iter__(self):
+        return iter(self._snapshot.columns)
+
+    def __len__(self):
+        return len(self._snapshot.columns)
+
+    def __repr__(self):
+        return 'SnapshotMember({0!r})'.format(dict(self))
+
+
+class MemberSnapshot(collections.Mapping):
+    """A members snapshot file, mapped read-only.
+
+    Maps identifier (usually scoutid) -> SnapshotMember. Values are
+    decoded from the mapping each time they are read. Columns can be
+    looked up by their raw or friendly names.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0,
+                              access=mmap.ACCESS_READ)
+
+        magic, version, self._nrows, nstrings, schema_len = \
+            HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError("{0} is not a member snapshot".format(path))
+
+        pos = HEADER.size
+        schema = json.loads(self._map[pos:pos + schema_len])
+        pos = _pad(pos + schema_len)
+
+        self.identifier = schema['identifier']
+        self.column_map = schema['column_map']
+        self.columns = [name for name, kind in schema['columns']]
+        self._reverse_column_map = dict(
+            [(v.replace(' ', ''), k) for k, v in self.column_map.items()])
+
+        self._offsets = pos
+        end_offset = struct.unpack_from('<I', self._map,
+                                        pos + 4 * nstrings)[0]
+        self._text = pos + 4 * (nstrings + 1)
+        pos = _pad(self._text + end_offset)
+
+        self._index = pos
+        pos = _pad(pos + 4 * self._nrows)
+
+        self._columns = {}
+        for name, kind in schema['columns']:
+            size = 8 if kind == 'q' else 4
+            self._columns[name] = (kind, pos)
+            pos = _pad(pos + size * self._nrows)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _string(self, n):
+        start, end = struct.unpack_from('<II', self._map,
+                                        self._offsets + 4 * n)
+        return self._map[self._text + start:self._text + end].decode('utf-8')
+
+    def _value(self, row, key):
+        try:
+            kind, pos = self._columns[key]
+        except KeyError:
+            try:
+                kind, pos = self._columns[self._reverse_column_map[key]]
+            except KeyError:
+                raise KeyError("%r object has no attribute %r" %
+                               ('SnapshotMember', key))
+
+        if kind == 'q':
+            return struct.unpack_from('<q', self._map, pos + 8 * row)[0]
+
+        n = struct.unpack_from('<I', self._map, pos + 4 * row)[0]
+        if n == NONE:
+            return None
+        if kind == 'j':
+            return json.loads(self._string(n))
+        return self._string(n)
+
+    def _row(self, identifier):
+        """Binary search the identifier index for identifier's row."""
+        identifier = unicode(identifier)
+        lo, hi = 0, self._nrows
+        while lo < hi:
+            mid = (lo + hi) // 2
+            row = struct.unpack_from('<I', self._map, self._index + 4 * mid)[0]
+            if unicode(self._value(row, self.identifier)) < identifier:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        if lo < self._nrows:
+            row = struct.unpack_from('<I', self._map, self._index + 4 * lo)[0]
+            if unicode(self._value(row, self.identifier)) == identifier:
+                return row
+        raise KeyError(identifier)
+
+    def __getitem__(self, identifier):
+        return SnapshotMember(self, self._row(identifier))
+
+    def __contains__(self, identifier):
+        try:
+            self._row(identifier)
+            return True
+        except KeyError:
+            return False
+
+    def __iter__(self):
+        for row in xrange(self._nrows):
+            yield self._value(row, self.identifier)
+
+    def __len__(self):
+        return self._nrows
@@ -0,0 +1,143 @@
+# coding=utf-8
+"""Sync many OSM accounts and sections from a pool of processes.
+
+Each (account, section) pair is a unit of work. Units are spread over
+a multiprocessing pool; each worker builds the Section, its Members
+and Badges with its own Accessor cache and sends back a compressed
+JSON summary which the parent merges as results arrive. A
+SharedThrottle keeps the combined request rate of all the workers
+within a limit.
+
+    accounts = [auth1, auth2]
+    results = Sync(accounts, processes=4, rate=5.0).run()
+"""
+
+import json
+import zlib
+import time
+import logging
+import multiprocessing
+
+import osm
+
+log = logging.getLogger(__name__)
+
+
+class SharedThrottle(osm.Throttle):
+    """A Throttle shared between the processes of a pool."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._lock = multiprocessing.Lock()
+        self._next_slot = multiprocessing.Value('d', 0.0, lock=False)
+
+    def _reserve(self, now):
+        with self._lock:
+            slot = max(now, self._next_slot.value)
+            self._next_slot.value = slot + 1.0 / self.rate
+        return slot
+
+
+def section_data(section):
+    """Return a plain, JSON serialisable summary of a Section."""
+    badges = {}
+    for badge_type in ('challenge', 'activity', 'staged', 'core'):
+        badges[badge_type] = [{'key': key,
+                               'name': badge.name,
+                               'table': badge.table,
+                               'activities': badge.keys()}
+                              for key, badge in
+                              getattr(section, badge_type).items()]
+
+    return {'section': dict(section._record),
+            'term': dict(section.term._record),
+            'members': [dict(member._record)
+                        for member in section.members.values()],
+            'badges': badges}
+
+
+def _init_worker(throttle):
+    osm.Accessor.throttle = throttle
+
+
+def _discover(auth):
+    try:
+        roles = osm.Accessor(auth)('api.php?action=getUserRoles')
+        return auth, [role['sectionid'] for role in roles
+                      if 'section' in role], None
+    except Exception as e:
+        return auth, [], str(e)
+
+
+def _sync_unit(unit):
+    auth, sectionid = unit
+    try:
+        section = osm.OSM(auth, sectionids=[sectionid]).sections[sectionid]
+        return (auth.userid, sectionid,
+                zlib.compress(json.dumps(section_data(section))), None)
+    except Exception as e:
+        log.exception("Sync of section {0} failed".format(sectionid))
+        return auth.userid, sectionid, None, str(e)
+
+
+class Sync(object):
+    """Sync every section of several accounts across a process pool.
+
+    accounts is a list of authorised Authorisor objects. sectionids
+    optionally restricts the sync to those sections. rate is the total
+    number of requests a second allowed across all the workers.
+    """
+
+    def __init__(self, accounts, sectionids=None, processes=None, rate=5.0):
+        self.accounts = accounts
+        self.sectionids = sectionids
+        self.processes = processes
+        self.rate = rate
+
+        self.errors = {}
+
+    def _pool(self):
+        return multiprocessing.Pool(self.processes, _init_worker,
+                                    (SharedThrottle(self.rate),))
+
+    def units(self, pool):
+        """Return the (account, sectionid) units of work."""
+        ret = []
+        for auth, sectionids, error in pool.imap(_discover, self.accounts):
+            if error is not None:
+                self.errors[(auth.userid, None)] = error
+                continue
+            ret.extend([(auth, sectionid) for sectionid in sectionids
+                        if self.sectionids is None or
+                        sectionid in self.sectionids])
+        return ret
+
+    def stream(self):
+        """Generate (userid, sectionid, data) as each unit finishes.
+
+        Units that fail are recorded in errors rather than yielded.
+        """
+        pool = self._pool()
+        try:
+            units = self.units(pool)
+            start = time.time()
+
+            for userid, sectionid, data, error in pool.imap_unordered(
+                    _sync_unit, units, chunksize=1):
+                if error is not None:
+                    self.errors[(userid, sectionid)] = error
+                    continue
+                yield userid, sectionid, json.loads(zlib.decompress(data))
+
+            log.info("Synced {0} sections in {1:.1f}s".format(
+                len(units), time.time() - start))
+        finally:
+            pool.close()
+            pool.join()
+
+    def run(self):
+        """Sync everything and return {(userid, sectionid): data}."""
+        ret = {}
+        for userid, sectionid, data in self.stream():
+            ret[(userid, sectionid)] = data
+        return ret
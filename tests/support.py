@@ -0,0 +1,200 @@
+# coding=utf-8
+"""Shared fixtures for the tests: a stubbed OSM web service.
+
+FakeOSM answers the requests pyosm makes from canned data and records
+each one, so tests can check what was (and was not) sent. It is
+installed in place of urllib2.urlopen by OSMTestCase.setUp().
+"""
+
+import os
+import sys
+import json
+import time
+import urllib2
+import urlparse
+import threading
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'src', 'pyosm'))
+
+import osm
+
+
+def member_records(sectionid, count=5):
+    return [{'scoutid': str(int(sectionid) * 100 + i),
+             'firstname': 'Kid%d' % i,
+             'lastname': 'Smith' if i % 2 else 'Jones',
+             'dob': '0%d/02/2010' % (i + 1),
+             'started': '01/09/2020',
+             'joined': '01/09/2020',
+             'patrol': 'Red' if i % 2 else 'Blue',
+             'patrolid': '1',
+             'patrolleader': '0',
+             'custom1': 'x%d' % i,
+             'email1': 'kid%d@example.com' % i,
+             'phone1': '0123 45678%d' % i}
+            for i in range(count)]
+
+
+class _Response(object):
+    def __init__(self, body):
+        self._body = body
+
+    def read(self):
+        return self._body
+
+
+class FakeOSM(object):
+    """Canned answers to the OSM API, keyed by action.
+
+    Tests change the data attributes to shape the responses, and look
+    at calls for the (url, data) of each request made.
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.delay = 0
+        self._lock = threading.Lock()
+
+        self.roles = [
+            {'sectionid': '1', 'sectionname': 'Cubs', 'section': 'cubs',
+             'isDefault': '1',
+             'sectionConfig': {'columnNames': {'custom1': 'Term to Scouts'}}},
+            {'sectionid': '2', 'sectionname': 'Scouts', 'section': 'scouts',
+             'isDefault': '0', 'sectionConfig': {}}]
+        self.terms = {
+            '1': [self.term('1', '11', 'Spring', '2026-01-01', '2026-04-01'),
+                  self.term('1', '10', 'Autumn', '2026-09-01', '2026-12-20')],
+            '2': [self.term('2', '20', 'Year', '2026-01-01', '2026-12-31')]}
+        self.members = {'1': member_records('1'), '2': member_records('2')}
+        self.badges = {
+            'badgeOrder': 'b2,b1', 'stock': {},
+            'details': {'b1': {'name': 'Artist', 'table': 't1'},
+                        'b2': {'name': 'Cook', 'table': 't2'}},
+            'structure': {
+                'b1': [{'rows': []},
+                       {'rows': [{'name': 'Draw', 'field': '_1'},
+                                 {'name': 'Paint', 'field': '_2'}]}],
+                'b2': [{'rows': []},
+                       {'rows': [{'name': 'Bake', 'field': '_3'}]}]}}
+        # sectionid -> getInitialBadges response, instead of badges.
+        self.section_badges = {}
+        # (sectionid, badge name) -> progress items; missing ones are empty.
+        self.progress = {}
+        # sectionid -> register rows
+        self.register = {}
+        # (sectionid, termid) -> events
+        self.events = {}
+        # eventid -> attendance rows
+        self.attendance = {}
+        # action, or (action, sectionid) -> response sent instead of
+        # the canned one, e.g. an {'error': ...} to make it fail.
+        self.failures = {}
+
+    @staticmethod
+    def event(eventid, name, start, end=None):
+        return {'eventid': eventid, 'name': name,
+                'startdate': start, 'enddate': end or start}
+
+    @staticmethod
+    def term(sectionid, termid, name, start, end):
+        return {'sectionid': sectionid, 'termid': termid, 'name': name,
+                'startdate': start, 'enddate': end}
+
+    def actions(self):
+        """Return the action (or page) of each request made, in order."""
+        ret = []
+        for url, data in self.calls:
+            parts = urlparse.urlsplit(url)
+            ret.append(dict(urlparse.parse_qsl(parts.query)).get(
+                'action', parts.path.lstrip('/')))
+        return ret
+
+    def route(self, url, data):
+        parts = urlparse.urlsplit(url)
+        query = dict(urlparse.parse_qsl(parts.query))
+        post = dict(urlparse.parse_qsl(data or ''))
+        action = query.get('action')
+
+        for failure in ((action, query.get('sectionid')), action):
+            if failure in self.failures:
+                return self.failures[failure]
+        if action == 'authorise':
+            return {'userid': 'u1', 'secret': 's1'}
+        if action == 'getUserRoles':
+            return self.roles
+        if action == 'getTerms':
+            return self.terms
+        if action == 'getInitialBadges':
+            return self.section_badges.get(query['sectionid'], self.badges)
+        if action == 'getUserDetails':
+            return {'identifier': 'scoutid',
+                    'items': self.members.get(query['sectionid'], [])}
+        if action == 'updateMember':
+            return {post['column']: post['value']}
+        if action == 'newMember':
+            return {'scoutid': '999'}
+        if action == 'getEvents':
+            return {'items': self.events.get(
+                (query['sectionid'], query['termid']), [])}
+        if action == 'getEventAttendance':
+            return {'items': self.attendance.get(query['eventid'], [])}
+        if action == 'register':
+            return {'identifier': 'scoutid',
+                    'items': self.register.get(query['sectionid'], [])}
+        if parts.path.endswith('challenges.php'):
+            return {'items': self.progress.get(
+                (query['sectionid'], query['c']), [])}
+        return 'Unknown request %s' % url
+
+    def urlopen(self, req, *args, **kwargs):
+        url, data = req.get_full_url(), req.get_data()
+        if self.delay:
+            time.sleep(self.delay)
+        with self._lock:
+            self.calls.append((url, data))
+        body = self.route(url, data)
+        if not isinstance(body, str):
+            body = json.dumps(body)
+        return _Response(body)
+
+
+def authorisor():
+    auth = osm.Authorisor('api', 'tok')
+    auth.userid = 'u1'
+    auth.secret = 's1'
+    return auth
+
+
+class OSMTestCase(unittest.TestCase):
+    """Stubs out the web service and resets the shared Accessor cache."""
+
+    def setUp(self):
+        self.server = FakeOSM()
+        self._urlopen = urllib2.urlopen
+        urllib2.urlopen = self.server.urlopen
+
+        osm.Accessor.clear_cache()
+        osm.Accessor.metrics.clear()
+        self.addCleanup(self._restore)
+
+    def _restore(self):
+        urllib2.urlopen = self._urlopen
+        osm.Accessor.clear_cache()
+        osm.Accessor.COMPRESSION = None
+        osm.Accessor.HOT_SIZE = 32
+        osm.Accessor.FRESH_TTL = None
+        osm.Accessor.STALE_WHILE_REVALIDATE = False
+        osm.Accessor.MAX_STALE = None
+        osm.Accessor.throttle = None
+        osm.Accessor.daemon = None
+        osm.Accessor.CACHE_FILE = None
+        osm.Accessor._cache_loaded = False
+
+    def osm(self, **kwargs):
+        group = osm.OSM(authorisor(), **kwargs)
+        self.addCleanup(group.close)
+        return group
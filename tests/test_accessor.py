@@ -0,0 +1,174 @@
+# coding=utf-8
+import pickle
+import StringIO
+
+import support
+
+import osm
+
+
+class AccessorTest(support.OSMTestCase):
+
+    def setUp(self):
+        support.OSMTestCase.setUp(self)
+        self.accessor = osm.Accessor(support.authorisor())
+
+    def test_equivalent_requests_share_a_key(self):
+        url = osm.Accessor.BASE_URL + 'users.php?b=2&a=1'
+        key = osm.Accessor.cache_key(url, {'x': u'1', 'token': 'a'})
+        self.assertEqual(
+            key, osm.Accessor.cache_key(osm.Accessor.BASE_URL +
+                                        'users.php?a=1&b=2',
+                                        {'x': '1', 'token': 'b'}))
+
+    def test_values_differing_in_spaces_do_not_share_a_key(self):
+        url = osm.Accessor.BASE_URL + 'users.php?action=updateMember'
+        self.assertNotEqual(osm.Accessor.cache_key(url, {'value': 'Smith '}),
+                            osm.Accessor.cache_key(url, {'value': 'Smith'}))
+
+    def test_second_request_is_cached(self):
+        self.accessor('api.php?action=getTerms')
+        self.accessor('api.php?action=getTerms')
+        self.assertEqual(self.server.actions(), ['getTerms'])
+
+    def test_refresh_fetches_again(self):
+        self.accessor('api.php?action=getTerms')
+        self.accessor('api.php?action=getTerms', refresh=True)
+        self.assertEqual(self.server.actions(), ['getTerms', 'getTerms'])
+
+    def test_response_stored_after_a_miss_is_not_fetched_again(self):
+        other = osm.Accessor(support.authorisor())
+
+        class Racing(osm.Accessor):
+            def _cached(self, key, canonical, fetch):
+                obj = osm.Accessor._cached(self, key, canonical, fetch)
+                # Another thread fetches it before this one gets to.
+                other('api.php?action=getTerms')
+                return obj
+
+        terms = Racing(support.authorisor())('api.php?action=getTerms')
+        self.assertEqual(terms, other('api.php?action=getTerms'))
+        self.assertEqual(self.server.actions(), ['getTerms'])
+
+    def test_save_and_load(self):
+        self.accessor('api.php?action=getTerms')
+        out = StringIO.StringIO()
+        osm.Accessor.__cache_save__(out)
+
+        osm.Accessor.clear_cache()
+        osm.Accessor.__cache_load__(StringIO.StringIO(out.getvalue()))
+        self.accessor('api.php?action=getTerms')
+        self.assertEqual(self.server.actions(), ['getTerms'])
+
+    def test_old_format_entries_are_dropped(self):
+        self.accessor('api.php?action=getTerms')
+        cache = dict(osm.Accessor.__cache__)
+        cache['https://old/url?x=1'] = {'items': []}
+        out = StringIO.StringIO()
+        pickle.dump(cache, out)
+
+        osm.Accessor.clear_cache()
+        osm.Accessor.__cache_load__(StringIO.StringIO(out.getvalue()))
+
+        self.assertEqual(len(osm.Accessor.__cache__), 1)
+        self.assertEqual(osm.Accessor.compression_report()['total'], 1)
+
+
+class InvalidationTest(support.OSMTestCase):
+
+    def setUp(self):
+        support.OSMTestCase.setUp(self)
+        self.group = self.osm()
+
+    def cached(self, action, sectionid):
+        return [canonical for canonical in osm.Accessor.cache_keys().values()
+                if action in canonical and
+                'sectionid={0}&'.format(sectionid) in canonical]
+
+    def test_member_write_only_drops_its_section(self):
+        self.assertTrue(self.cached('getUserDetails', '1'))
+        self.assertTrue(self.cached('getUserDetails', '2'))
+        keys = len(osm.Accessor.__cache__)
+
+        member = self.group.sections['1'].members['100']
+        member['firstname'] = 'B'
+        member.save()
+
+        cached = [osm.Accessor.cache_keys().get(key)
+                  for key in osm.Accessor.__cache__]
+        self.assertFalse([c for c in cached if 'sectionid=1&' in c])
+        self.assertTrue([c for c in cached if 'sectionid=2&' in c])
+        self.assertTrue([c for c in cached if 'getUserRoles' in c])
+        self.assertLess(len(osm.Accessor.__cache__), keys)
+
+    def test_repeated_writes_are_sent(self):
+        member = self.group.sections['1'].members['100']
+        for name in ('B', 'C', 'B'):
+            member['firstname'] = name
+            member.save()
+        self.assertEqual(self.server.actions().count('updateMember'), 3)
+
+    def test_section_id_prefix_is_not_matched(self):
+        self.server.roles.append(
+            {'sectionid': '11', 'sectionname': 'Beavers', 'section': 'beavers',
+             'isDefault': '0', 'sectionConfig': {}})
+        self.server.terms['11'] = [
+            self.server.term('11', '110', 'Year', '2026-01-01', '2026-12-31')]
+        osm.Accessor.clear_cache()
+        group = self.osm()
+        self.assertIn('11', group.sections)
+
+        osm.Accessor.invalidate_section('1')
+        cached = [osm.Accessor.cache_keys().get(key)
+                  for key in osm.Accessor.__cache__]
+        self.assertTrue([c for c in cached if 'sectionid=11&' in c])
+
+
+class CredentialsTest(support.OSMTestCase):
+
+    def test_password_is_not_in_the_canonical_request(self):
+        accessor = osm.Accessor(support.authorisor())
+        explained = accessor.explain('users.php?action=authorise',
+                                     {'email': 'a@example.com',
+                                      'password': 'hunter2'},
+                                     authorising=True)
+        self.assertNotIn('hunter2', explained['canonical'])
+        self.assertNotIn('tok', explained['canonical'])
+
+    def test_authorise_is_never_cached(self):
+        auth = osm.Authorisor('api', 'tok')
+        auth.authorise('a@example.com', 'hunter2')
+        auth.authorise('a@example.com', 'hunter2')
+
+        self.assertEqual((auth.userid, auth.secret), ('u1', 's1'))
+        self.assertEqual(self.server.actions(), ['authorise', 'authorise'])
+        self.assertEqual(osm.Accessor.cache_keys(), {})
+
+    def test_errors_do_not_hold_credentials(self):
+        self.server.failures['getTerms'] = {'error': 'Bad request'}
+        accessor = osm.Accessor(support.authorisor())
+        try:
+            accessor('api.php?action=getTerms')
+        except osm.OSMException as e:
+            message = str(e)
+        self.assertIn('Bad request', message)
+        self.assertNotIn("'s1'", message)
+        self.assertNotIn("'tok'", message)
+
+        self.server.failures['authorise'] = 'Incorrect password'
+        auth = osm.Authorisor('api', 'tok')
+        try:
+            auth.authorise('a@example.com', 'hunter2')
+        except osm.OSMException as e:
+            message = str(e)
+        self.assertIn('Incorrect password', message)
+        self.assertNotIn('hunter2', message)
+        self.assertNotIn("'tok'", message)
+
+    def test_explain_matches_the_request_key(self):
+        accessor = osm.Accessor(support.authorisor())
+        accessor('api.php?action=getTerms')
+        explained = accessor.explain('api.php?action=getTerms')
+        self.assertTrue(explained['cached'])
+        self.assertIn(explained['key'], osm.Accessor.cache_keys())
+
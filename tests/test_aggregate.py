@@ -0,0 +1,68 @@
+# coding=utf-8
+import copy
+
+import support
+
+from aggregate import BadgeProgress, is_done
+
+
+class BadgeProgressTest(support.OSMTestCase):
+
+    def setUp(self):
+        support.OSMTestCase.setUp(self)
+        # The scouts' Artist badge has a third activity the cubs' lacks.
+        scouts = copy.deepcopy(self.server.badges)
+        scouts['structure']['b1'][1]['rows'].append(
+            {'name': 'Sculpt', 'field': '_4'})
+        self.server.section_badges['2'] = scouts
+
+        self.server.progress[('1', 'artist')] = [
+            {'scoutid': '100', '_1': 'done', '_2': 'yes'},
+            {'scoutid': '101', '_1': 'done', '_2': ''},
+            {'scoutid': '102', '_1': 'x', '_2': ''}]
+        self.server.progress[('2', 'artist')] = [
+            {'scoutid': '200', '_1': 'done', '_2': 'yes', '_4': 'yes'},
+            {'scoutid': '201', '_1': 'done', '_2': 'yes', '_4': ''}]
+
+        self.progress = BadgeProgress(self.osm(),
+                                      badge_types=('challenge',))
+
+    def test_is_done(self):
+        self.assertTrue(is_done('yes'))
+        self.assertTrue(is_done(1))
+        self.assertFalse(is_done(''))
+        self.assertFalse(is_done(None))
+        self.assertFalse(is_done('x passed later'))
+
+    def test_badges_are_kept_per_section_type(self):
+        self.assertIn(('cubs', 'challenge', u'Artist'),
+                      self.progress.badges())
+        self.assertIn(('scouts', 'challenge', u'Artist'),
+                      self.progress.badges())
+        self.assertEqual(
+            self.progress.activities(('cubs', 'challenge', u'Artist')),
+            [u'Draw', u'Paint'])
+
+    def test_completion(self):
+        cubs = ('cubs', 'challenge', u'Artist')
+        scouts = ('scouts', 'challenge', u'Artist')
+
+        self.assertEqual(self.progress.completed(cubs), 1)
+        self.assertEqual(self.progress.completed_by(cubs), [('1', '100')])
+        self.assertAlmostEqual(self.progress.percentage(cubs), 100.0 / 3)
+        self.assertEqual(self.progress.completed(scouts), 1)
+        self.assertEqual(self.progress.activity_counts(cubs),
+                         [(u'Draw', 2), (u'Paint', 1)])
+
+    def test_near_completion(self):
+        self.assertEqual(
+            self.progress.near_completion(('cubs', 'challenge', u'Artist')),
+            [('1', '101', [u'Paint'])])
+        self.assertEqual(
+            self.progress.near_completion(('scouts', 'challenge', u'Artist')),
+            [('2', '201', [u'Sculpt'])])
+
+    def test_no_progress_records(self):
+        cook = ('cubs', 'challenge', u'Cook')
+        self.assertEqual(self.progress.members(cook), 0)
+        self.assertIsNone(self.progress.percentage(cook))
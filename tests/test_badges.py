@@ -0,0 +1,66 @@
+# coding=utf-8
+import threading
+
+import support
+
+import osm
+
+
+class BadgesTest(support.OSMTestCase):
+
+    def setUp(self):
+        support.OSMTestCase.setUp(self)
+        self.badges = self.osm().sections['1'].challenge
+
+    def test_badges_are_built_on_first_use(self):
+        self.assertEqual(self.badges._record, {})
+        self.assertIn('b1', self.badges)
+        self.assertNotIn('b9', self.badges)
+        self.assertEqual(len(self.badges), 2)
+        self.assertEqual(self.badges._record, {})
+
+        badge = self.badges['b1']
+        self.assertEqual(self.badges._record.keys(), ['b1'])
+        self.assertIs(self.badges['b1'], badge)
+        self.assertIsNone(badge._activities)
+        self.assertEqual(sorted(badge.keys()), ['Draw', 'Paint'])
+        self.assertEqual(badge.activity_fields(),
+                         [('_1', 'Draw'), ('_2', 'Paint')])
+
+        self.assertRaises(KeyError, lambda: self.badges['b9'])
+
+    def test_order(self):
+        self.assertEqual(list(self.badges), ['b2', 'b1'])
+        self.assertEqual([badge.name for badge in self.badges.values()],
+                         ['Cook', 'Artist'])
+
+        # Keys missing from badgeOrder follow it, sorted, and keys in
+        # it without details are left out.
+        self.badges._details['a0'] = {'name': 'Astronomer', 'table': 't0'}
+        self.badges._order = ['b1', 'b7']
+        self.assertEqual(self.badges.order(), ['b1', 'a0', 'b2'])
+
+    def test_concurrent_lookups_share_one_badge(self):
+        found = []
+        start = threading.Event()
+
+        def lookup():
+            start.wait()
+            found.append(self.badges['b2'])
+
+        threads = [threading.Thread(target=lookup) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        start.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(found), 8)
+        self.assertEqual(len(set([id(badge) for badge in found])), 1)
+        self.assertIs(found[0], self.badges['b2'])
+
+    def test_badge_without_activities(self):
+        badge = osm.Badge(None, None, None, 'challenge',
+                          {'name': 'Empty', 'table': 't'}, [{'rows': []}])
+        self.assertEqual(badge.keys(), [])
+        self.assertEqual(badge.activity_fields(), [])
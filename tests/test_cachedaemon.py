@@ -0,0 +1,82 @@
+# coding=utf-8
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import support
+
+import osm
+import cachedaemon
+
+
+class StoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.store = cachedaemon.Store(ttl=60, size=3)
+
+    def test_lru_eviction(self):
+        for key in 'abcd':
+            self.store.set(key, '/x?k=' + key, (0, key))
+        self.assertIsNone(self.store.get('a'))
+        self.assertEqual(self.store.get('d'), (0, 'd'))
+
+    def test_lease_then_hit(self):
+        self.assertEqual(self.store.lease('a'), ('lease', None))
+        self.store.set('a', '/x', (0, 1))
+        self.assertEqual(self.store.lease('a'), ('hit', (0, 1)))
+
+    def test_invalidate_by_pattern(self):
+        self.store.set('a', '/x?sectionid=1&t=1|', (0, 1))
+        self.store.set('b', '/x?sectionid=11&t=1|', (0, 2))
+        self.store.set('c', '/y?t=1|sectionid=1', (0, 3))
+
+        self.assertEqual(
+            self.store.invalidate(None, r'[?&|]sectionid=1(?:[&|]|$)'), 2)
+        self.assertEqual(self.store.get('b'), (0, 2))
+
+    def test_invalidate_all(self):
+        self.store.set('a', '/x', (0, 1))
+        self.assertEqual(self.store.invalidate(), 1)
+        self.assertIsNone(self.store.get('a'))
+
+
+class DaemonTest(support.OSMTestCase):
+
+    def setUp(self):
+        support.OSMTestCase.setUp(self)
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        self.path = os.path.join(tmp, 'cache.sock')
+
+        self.daemon = cachedaemon.CacheDaemon(self.path)
+        thread = threading.Thread(target=self.daemon.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(self.daemon.server_close)
+        self.addCleanup(self.daemon.shutdown)
+
+        osm.Accessor.use_daemon(self.path)
+
+    def test_socket_is_private(self):
+        self.assertEqual(os.stat(self.path).st_mode & 0777, 0600)
+
+    def test_other_process_cache_is_used(self):
+        accessor = osm.Accessor(support.authorisor())
+        accessor('api.php?action=getTerms')
+
+        # A process with an empty cache of its own.
+        osm.Accessor.__cache__ = {}
+        accessor('api.php?action=getTerms')
+        self.assertEqual(self.server.actions(), ['getTerms'])
+
+    def test_member_write_keeps_other_sections(self):
+        group = self.osm()
+        member = group.sections['1'].members['100']
+        member['firstname'] = 'B'
+        member.save()
+
+        stats = osm.Accessor.daemon.stats()
+        self.assertGreater(stats['entries'], 0)
+        self.assertGreater(stats['invalidated'], 0)
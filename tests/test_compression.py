@@ -0,0 +1,61 @@
+# coding=utf-8
+import StringIO
+
+import support
+
+import osm
+
+
+class CompressionTest(support.OSMTestCase):
+
+    def test_compressed_responses_decode(self):
+        osm.Accessor.use_compression('zlib', hot_size=1)
+        accessor = osm.Accessor(support.authorisor())
+        terms = accessor('api.php?action=getTerms')
+        accessor('api.php?action=getUserRoles')
+
+        # getTerms has left the hot tier, so it is decompressed again.
+        self.assertEqual(accessor('api.php?action=getTerms'), terms)
+        self.assertEqual(osm.Accessor.metrics['decompressed'], 1)
+        self.assertEqual(self.server.actions(), ['getTerms', 'getUserRoles'])
+
+        report = osm.Accessor.compression_report()
+        self.assertEqual(report['entries'], 2)
+        self.assertEqual(report['ratio'],
+                         float(report['raw']) / report['compressed'])
+
+    def test_unknown_codec(self):
+        self.assertRaises(ValueError, osm.Accessor.use_compression, 'rar')
+
+    def test_hot_tier_is_bounded(self):
+        osm.Accessor.use_compression('bz2', hot_size=2)
+        accessor = osm.Accessor(support.authorisor())
+        for action in ('getTerms', 'getUserRoles', 'getInitialBadges'):
+            accessor('api.php?action=' + action + '&sectionid=1')
+
+        self.assertEqual(len(osm.Accessor.__hot__), 2)
+        self.assertEqual(osm.Accessor.compression_report()['entries'], 3)
+        accessor('api.php?action=getInitialBadges&sectionid=1')
+        self.assertEqual(osm.Accessor.metrics['hot_hit'], 1)
+
+    def test_refreshed_response_replaces_the_hot_copy(self):
+        osm.Accessor.use_compression('zlib')
+        accessor = osm.Accessor(support.authorisor())
+        accessor('api.php?action=getTerms')
+        self.server.terms['2'][0]['name'] = 'Renamed'
+        accessor('api.php?action=getTerms', refresh=True)
+        self.assertEqual(accessor('api.php?action=getTerms')['2'][0]['name'],
+                         'Renamed')
+
+    def test_compressed_cache_is_saved_and_loaded(self):
+        osm.Accessor.use_compression('zlib')
+        accessor = osm.Accessor(support.authorisor())
+        terms = accessor('api.php?action=getTerms')
+        out = StringIO.StringIO()
+        osm.Accessor.__cache_save__(out)
+
+        osm.Accessor.clear_cache()
+        osm.Accessor.__cache_load__(StringIO.StringIO(out.getvalue()))
+        self.assertEqual(accessor('api.php?action=getTerms'), terms)
+        self.assertEqual(osm.Accessor.metrics['decompressed'], 1)
+        self.assertEqual(self.server.actions(), ['getTerms'])
@@ -0,0 +1,72 @@
+# coding=utf-8
+import datetime
+import unittest
+
+import support
+
+import osm
+
+
+class ParseDateTest(unittest.TestCase):
+
+    def test_fixed_formats(self):
+        self.assertEqual(osm.parse_date('2026-03-04'),
+                         datetime.datetime(2026, 3, 4))
+        self.assertEqual(osm.parse_date('04/03/2026', osm.UK_DATE),
+                         datetime.datetime(2026, 3, 4))
+        self.assertEqual(osm.parse_date('4 Mar 2026', '%d %b %Y'),
+                         datetime.datetime(2026, 3, 4))
+        self.assertIsNone(osm.parse_date(''))
+        self.assertIsNone(osm.parse_date(None))
+
+    def test_results_are_memoised(self):
+        first = osm.parse_date('2026-05-06')
+        self.assertIs(osm.parse_date('2026-05-06'), first)
+        self.assertIn(('2026-05-06', osm.GENERIC_DATE), osm._date_cache)
+
+    def test_invalid_dates(self):
+        self.assertRaises(ValueError, osm.parse_date, '2026-13-01')
+        self.assertRaises(ValueError, osm.parse_date, 'soon')
+        self.assertEqual(osm.parse_dates(['2026-01-02', 'soon', '',
+                                          '2026-01-02']),
+                         [datetime.datetime(2026, 1, 2), None, None,
+                          datetime.datetime(2026, 1, 2)])
+
+    def test_age_at(self):
+        dob = datetime.datetime(2010, 3, 15)
+        self.assertEqual(osm.age_at(dob, datetime.datetime(2026, 3, 14)),
+                         (15, 11))
+        self.assertEqual(osm.age_at(dob, datetime.datetime(2026, 3, 15)),
+                         (16, 0))
+
+
+class MemberDatesTest(support.OSMTestCase):
+
+    def setUp(self):
+        support.OSMTestCase.setUp(self)
+        self.members = self.osm().sections['1'].members
+
+    def test_dates(self):
+        dates = self.members.dates('dob')
+        self.assertEqual(dates['100'], datetime.datetime(2010, 2, 1))
+        self.assertEqual(dates['104'], datetime.datetime(2010, 2, 5))
+        self.assertEqual(self.members['101'].date('dob'), dates['101'])
+
+    def test_only_date_columns_are_parsed(self):
+        self.assertRaises(ValueError, self.members.dates, 'firstname')
+        self.assertRaises(ValueError, self.members.dates, 'Term to Scouts')
+        self.assertRaises(ValueError, self.members['100'].date, 'custom1')
+
+    def test_ages_are_kept_per_date(self):
+        self.members['102']['dob'] = ''
+        on = datetime.date(2026, 2, 3)
+        ages = self.members.ages(on)
+
+        self.assertEqual(ages['100'], (16, 0))
+        self.assertEqual(ages['103'], (15, 11))
+        self.assertIsNone(ages['102'])
+        self.assertIs(self.members.ages(on), ages)
+        self.assertEqual(self.members['100'].age(on), (16, 0))
+
+        self.members.clear_derived()
+        self.assertIsNot(self.members.ages(on), ages)
@@ -0,0 +1,85 @@
+# coding=utf-8
+import support
+
+import dedup
+from dedup import find_duplicates
+
+
+class FindDuplicatesTest(support.OSMTestCase):
+
+    def setUp(self):
+        support.OSMTestCase.setUp(self)
+        for i, record in enumerate(self.server.members['2']):
+            record.update({'firstname': 'Scout%d' % i,
+                           'dob': '0%d/03/2008' % (i + 1),
+                           'email1': 'scout%d@example.com' % i,
+                           'phone1': '0199 12345%d' % i})
+        # Kid1 Smith moved from cubs to scouts and was entered again,
+        # with a typo and a different phone number.
+        moved = dict(self.server.members['1'][1], scoutid='299',
+                     firstname='Kidl', phone1='07000 000000')
+        self.server.members['2'].append(moved)
+
+    def test_moved_member_is_found(self):
+        clusters = find_duplicates(self.osm())
+        self.assertEqual(len(clusters), 1)
+
+        docs = sorted([(sectionid, member['scoutid'])
+                       for sectionid, member in clusters[0].members])
+        self.assertEqual(docs, [('1', '101'), ('2', '299')])
+        self.assertIn('dob', clusters[0].matches[0].reasons)
+
+    def test_threshold(self):
+        self.assertEqual(find_duplicates(self.osm(), threshold=1.01), [])
+
+    def test_large_blocks_are_skipped(self):
+        # Everyone in section 2 shares the same phone number.
+        for record in self.server.members['2']:
+            record['phone1'] = '01234 567890'
+            record['dob'] = ''
+        self.assertEqual(find_duplicates(self.osm(), max_block=3), [])
+
+    def test_matches_are_over_the_threshold(self):
+        for cluster in find_duplicates(self.osm(), threshold=0.5):
+            for match in cluster.matches:
+                self.assertGreaterEqual(match.score, 0.5)
+                self.assertNotEqual(match.a, match.b)
+
+    def test_chained_matches_form_one_cluster(self):
+        # Entered a third time, matching only the second entry's phone.
+        again = dict(self.server.members['2'][-1], scoutid='298',
+                     firstname='Kid1', dob='', phone1='07000 000000')
+        self.server.members['2'].append(again)
+
+        clusters = find_duplicates(self.osm())
+        self.assertEqual(len(clusters), 1)
+        docs = sorted([(sectionid, member['scoutid'])
+                       for sectionid, member in clusters[0].members])
+        self.assertEqual(docs, [('1', '101'), ('2', '298'), ('2', '299')])
+        matched = set([match.a for match in clusters[0].matches] +
+                      [match.b for match in clusters[0].matches])
+        self.assertEqual(sorted(matched), docs)
+
+
+class ScoreTest(support.OSMTestCase):
+
+    def record(self, **values):
+        member = {'firstname': 'Kid', 'lastname': 'Smith', 'dob': ''}
+        member.update(values)
+        return dedup._Record(('1', '1'), member)
+
+    def test_reasons(self):
+        a = self.record(dob='01/02/2010', email1='Kid@Example.com',
+                        phone1='0199 123456')
+        b = self.record(dob='01/02/2010', email1='kid@example.com',
+                        phone1='0199-123-456')
+        total, reasons = dedup.score(a, b)
+        self.assertAlmostEqual(total, 1.0)
+        self.assertEqual(reasons, ['name', 'dob', 'phone', 'email'])
+
+    def test_different_names_score_low(self):
+        total, reasons = dedup.score(self.record(),
+                                     self.record(firstname='Zed',
+                                                 lastname='Quill'))
+        self.assertLess(total, 0.25)
+        self.assertEqual(reasons, [])
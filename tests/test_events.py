@@ -0,0 +1,83 @@
+# coding=utf-8
+import time
+import datetime
+
+import support
+
+import osm
+
+
+class EventsTest(support.OSMTestCase):
+
+    def setUp(self):
+        support.OSMTestCase.setUp(self)
+        event = self.server.event
+        self.server.events = {
+            ('1', '11'): [event('1', 'Hike', '2026-02-01'),
+                          event('2', 'Camp', '2026-03-20', '2026-03-22'),
+                          event('3', 'TBC', '')],
+            ('1', '10'): [event('4', 'Fireworks', '2026-11-05'),
+                          event('5', 'Carols', '2026-12-18')]}
+        self.server.attendance = {
+            '1': [{'scoutid': '100', 'attending': 'Yes'}],
+            '4': [{'scoutid': '101', 'attending': 'No'}]}
+        self.section = self.osm().sections['1']
+        del self.server.calls[:]
+
+    def fetched(self, action):
+        return [url for url, data in self.server.calls if action in url]
+
+    def test_terms_are_fetched_as_events_are_consumed(self):
+        events = self.section.events()
+        self.assertEqual(self.fetched('getEvents'), [])
+
+        self.assertEqual(next(events)['name'], 'Hike')
+        self.assertEqual(len(self.fetched('getEvents')), 1)
+        self.assertIn('termid=11', self.fetched('getEvents')[0])
+
+        self.assertEqual([e['eventid'] for e in events], ['2', '3', '4', '5'])
+        self.assertEqual(len(self.fetched('getEvents')), 2)
+
+    def test_date_range(self):
+        events = list(self.section.events(start=datetime.date(2026, 3, 1),
+                                          end=datetime.date(2026, 11, 30)))
+        self.assertEqual([e['eventid'] for e in events], ['2', '4'])
+        self.assertEqual(events[0].enddate, datetime.datetime(2026, 3, 22))
+
+        autumn = list(self.section.events(start=datetime.date(2026, 9, 1)))
+        self.assertEqual([e['eventid'] for e in autumn], ['4', '5'])
+        # The spring term ends before the range, so it was not fetched
+        # again, and no attendance was fetched for any event.
+        self.assertEqual(len(self.fetched('getEvents')), 2)
+        self.assertEqual(self.fetched('getEventAttendance'), [])
+
+    def test_overlapping_terms_do_not_repeat_events(self):
+        self.server.terms['1'].append(
+            self.server.term('1', '12', 'Summer', '2026-03-15', '2026-09-30'))
+        self.server.events[('1', '12')] = [
+            self.server.event('2', 'Camp', '2026-03-20', '2026-03-22'),
+            self.server.event('6', 'Sports day', '2026-07-01')]
+        osm.Accessor.clear_cache()
+        section = self.osm().sections['1']
+
+        self.assertEqual([e['eventid'] for e in section.events()],
+                         ['1', '2', '3', '6', '4', '5'])
+
+    def test_attendance(self):
+        events = dict([(e['eventid'], e) for e in self.section.events()])
+        self.assertEqual(events['1'].attendance()[0]['attending'], 'Yes')
+        self.assertEqual(events['2'].attendance(), [])
+        events['1'].attendance()
+        self.assertEqual(len(self.fetched('getEventAttendance')), 2)
+
+    def test_attendance_is_fetched_concurrently(self):
+        events = list(self.section.events())
+        self.server.delay = 0.1
+
+        start = time.time()
+        attendance = self.section.fetch_attendance(events, workers=5)
+        self.assertLess(time.time() - start, 0.4)
+
+        self.assertEqual(sorted(attendance.keys()), ['1', '2', '3', '4', '5'])
+        self.assertEqual(attendance['4'][0]['scoutid'], '101')
+        self.assertEqual(len(self.fetched('getEventAttendance')), 5)
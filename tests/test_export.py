@@ -0,0 +1,57 @@
+# coding=utf-8
+import csv
+import json
+import StringIO
+
+import support
+
+import export
+
+
+class ExportTest(support.OSMTestCase):
+
+    def setUp(self):
+        support.OSMTestCase.setUp(self)
+        # Only the scouts have a second custom column.
+        for record in self.server.members['2']:
+            record['custom2'] = 'badge'
+        self.sections = [self.osm().sections[sectionid]
+                         for sectionid in ('1', '2')]
+
+    def test_member_rows_share_columns_across_sections(self):
+        rows = list(export.member_rows(self.sections))
+        self.assertEqual(len(rows), 10)
+        self.assertEqual(set([tuple(row.keys()) for row in rows]),
+                         set([tuple(rows[0].keys())]))
+        self.assertEqual(rows[0].keys()[:4], list(export.MEMBER_COLUMNS))
+        self.assertIn('TermtoScouts', rows[0])
+        self.assertIn('custom2', rows[0])
+
+    def test_csv_keeps_later_sections_columns(self):
+        out = StringIO.StringIO()
+        count = export.write_csv(export.member_rows(self.sections), out)
+        self.assertEqual(count, 10)
+
+        out.seek(0)
+        rows = list(csv.DictReader(out))
+        self.assertEqual(rows[0]['custom2'], '')
+        self.assertEqual(rows[-1]['custom2'], 'badge')
+        self.assertEqual(sorted([row['TermtoScouts'] for row in rows[:5]]),
+                         ['x0', 'x1', 'x2', 'x3', 'x4'])
+
+    def test_raw_column_names(self):
+        rows = list(export.member_rows(self.sections, friendly=False))
+        self.assertIn('custom1', rows[0])
+        self.assertNotIn('TermtoScouts', rows[0])
+
+    def test_jsonl(self):
+        out = StringIO.StringIO()
+        export.export(export.member_rows(self.sections[:1]), out, 'jsonl')
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(sorted([json.loads(line)['scoutid']
+                                 for line in lines]),
+                         ['100', '101', '102', '103', '104'])
+
+    def test_unknown_format(self):
+        self.assertRaises(ValueError, export.export, [], None, 'xml')
@@ -0,0 +1,70 @@
+# coding=utf-8
+import support
+
+import osm
+
+
+class MemberChangesTest(support.OSMTestCase):
+
+    def setUp(self):
+        support.OSMTestCase.setUp(self)
+        self.group = self.osm()
+        self.section = self.group.sections['1']
+        self.member = self.section.members['100']
+
+    def test_unchanged_member_sends_nothing(self):
+        self.member['firstname'] = self.member['firstname']
+        self.assertEqual(self.member.changes(), {})
+
+        del self.server.calls[:]
+        self.assertTrue(self.member.save())
+        self.assertEqual(self.server.calls, [])
+
+    def test_reverted_field_is_not_a_change(self):
+        original = self.member['lastname']
+        self.member['lastname'] = 'Other'
+        self.member['lastname'] = original
+        self.member['firstname'] = 'A'
+        self.member['firstname'] = 'B'
+
+        changes = self.member.changes()
+        self.assertEqual(changes.keys(), ['firstname'])
+        self.assertEqual(changes['firstname'],
+                         osm.FieldChange('firstname', 'Kid0', 'B'))
+
+    def test_dry_run_does_not_write(self):
+        self.member['firstname'] = 'B'
+        del self.server.calls[:]
+
+        changes = self.member.save(dry_run=True)
+        self.assertEqual(changes.keys(), ['firstname'])
+        self.assertEqual(self.server.calls, [])
+        self.assertEqual(self.member.changes(), changes)
+
+    def test_save_sends_changes_once(self):
+        self.member['firstname'] = 'B'
+        del self.server.calls[:]
+
+        self.assertTrue(self.member.save())
+        self.assertEqual(self.server.actions(), ['updateMember'])
+        self.assertEqual(self.member.changes(), {})
+
+        self.member.save()
+        self.assertEqual(self.server.actions(), ['updateMember'])
+
+    def test_friendly_name_sets_raw_column(self):
+        self.member['Term to Scouts'.replace(' ', '')] = 'soon'
+        self.assertEqual(self.member.changes().keys(), ['custom1'])
+        self.assertNotIn('TermtoScouts', self.member._record)
+
+    def test_new_member_changes(self):
+        member = self.section.members.new_member(
+            'New', 'Member', '01/01/2015', '01/09/2026', '01/09/2026')
+        changes = member.changes()
+
+        self.assertEqual(changes['firstname'].new, 'New')
+        self.assertEqual(changes['startedsection'],
+                         osm.FieldChange('startedsection', None,
+                                         '01/09/2026'))
+        # Columns set to the value they already had are not changes.
+        self.assertNotIn('phone1', changes)
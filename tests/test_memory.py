@@ -0,0 +1,44 @@
+# coding=utf-8
+import support
+
+import osm
+
+
+class MemoryReportTest(support.OSMTestCase):
+
+    def setUp(self):
+        support.OSMTestCase.setUp(self)
+        self.group = self.osm()
+        self.report = self.group.memory_report()
+
+    def test_report_covers_sections_and_cache(self):
+        sections = self.report['sections']
+        self.assertEqual(sorted(sections.keys()), ['1', '2'])
+        self.assertEqual(sorted(sections['1'].keys()),
+                         ['Badges.activity', 'Badges.challenge',
+                          'Badges.core', 'Badges.staged', 'Members',
+                          'Register', 'Section', 'Term'])
+        self.assertGreater(sections['1']['Members']['bytes'], 0)
+        self.assertGreater(self.report['term_index']['objects'], 0)
+        self.assertEqual(sorted(self.report['cache'].keys()),
+                         sorted(osm.Accessor.cache_keys().values()))
+        self.assertGreater(self.report['types']['Member'], 0)
+
+    def test_totals_add_up(self):
+        total = {'bytes': 0, 'objects': 0}
+        for report in self.report['sections'].values() + \
+                [self.report['cache'], {'': self.report['term_index']}]:
+            for item in report.values():
+                total['bytes'] += item['bytes']
+                total['objects'] += item['objects']
+        self.assertEqual(self.report['total'], total)
+
+    def test_objects_are_counted_once(self):
+        # The member records are the decoded getUserDetails response,
+        # so its cache entry only adds what the Members do not hold.
+        members = [item for canonical, item in self.report['cache'].items()
+                   if 'getUserDetails' in canonical and 'sectionid=1&' in
+                   canonical][0]
+        self.assertLess(members['bytes'],
+                        self.report['sections']['1']['Members']['bytes'])
+        self.assertEqual(self.report['types']['Member'], 10)
@@ -0,0 +1,65 @@
+# coding=utf-8
+import threading
+
+import support
+
+import osm
+
+
+class PublishTest(support.OSMTestCase):
+
+    def test_state_is_published_together(self):
+        group = self.osm()
+        errors = []
+        done = threading.Event()
+
+        def read():
+            while not done.is_set():
+                state = group.state
+                for sectionid, section in state.sections.items():
+                    if section.term not in state.term_index.terms(sectionid):
+                        errors.append(sectionid)
+                        return
+
+        threads = [threading.Thread(target=read) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        try:
+            for i in range(10):
+                group.refresh()
+        finally:
+            done.set()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertIs(group.sections, group.state.sections)
+        self.assertIs(group.term_index, group.state.term_index)
+
+    def test_state_fields_can_be_assigned(self):
+        group = self.osm()
+        term_index = group.term_index
+        group.section = group.sections['2']
+
+        self.assertEqual(group.section['sectionid'], '2')
+        self.assertIs(group.state.section, group.sections['2'])
+        self.assertIs(group.state.term_index, term_index)
+
+        group.sections = {'2': group.sections['2']}
+        self.assertEqual(group.state.sections.keys(), ['2'])
+        self.assertIs(group.state.section, group.sections['2'])
+
+
+class CachePutTest(support.OSMTestCase):
+
+    def test_puts_update_the_cache_in_place(self):
+        cache = osm.Accessor.__cache__
+        for i in range(1000):
+            osm.Accessor.__cache_set__('key%d' % i, '/x?i=%d' % i, i)
+
+        self.assertIs(osm.Accessor.__cache__, cache)
+        self.assertEqual(len(osm.Accessor.cache_keys()), 1000)
+        osm.Accessor.__cache_remove__('key1')
+        self.assertNotIn('key1', osm.Accessor.cache_keys())
+        self.assertEqual(len(osm.Accessor.__cache__), 999)
+
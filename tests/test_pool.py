@@ -0,0 +1,57 @@
+# coding=utf-8
+import support
+
+import osm
+
+
+def fresh(text):
+    # A new string object equal to text, as json.loads would make.
+    return ''.join(list(text))
+
+
+class ValuePoolTest(support.OSMTestCase):
+
+    def test_intern(self):
+        pool = osm.ValuePool()
+        first = pool.intern(fresh('Red'))
+        second = fresh('Red')
+        self.assertIsNot(first, second)
+        self.assertIs(pool.intern(second), first)
+        self.assertEqual(pool.saved, osm.sys.getsizeof(second))
+        self.assertEqual(pool.intern(3), 3)
+        self.assertEqual(len(pool), 1)
+
+    def test_records_share_keys_and_repeated_values(self):
+        records = [{fresh('patrol'): fresh('Red'),
+                    fresh('firstname'): fresh('Kid%d' % i),
+                    fresh('custom2'): fresh('Yes')}
+                   for i in range(6)]
+        pool = osm.ValuePool()
+        saved = pool.intern_records(records)
+
+        self.assertGreater(saved, 0)
+        first, second = records[0], records[1]
+        self.assertIs([k for k in first if k == 'patrol'][0],
+                      [k for k in second if k == 'patrol'][0])
+        self.assertIs(first['patrol'], second['patrol'])
+        self.assertIs(first['custom2'], second['custom2'])
+        # Mostly distinct values are left alone.
+        self.assertNotIn('Kid0', pool._values)
+
+    def test_sections_share_one_pool(self):
+        group = self.osm()
+        self.assertIs(group.sections['1'].members['100']['patrol'],
+                      group.sections['2'].members['200']['patrol'])
+        self.assertGreater(len(group.value_pool), 0)
+
+    def test_members_memory_report(self):
+        members = self.osm().sections['1'].members
+        report = members.memory_report()
+        self.assertEqual(report['members'], 5)
+        self.assertGreater(report['interned'], 0)
+        self.assertLess(report['values'], report['unshared'])
+
+        osm.Accessor.clear_cache()
+        members = self.osm(intern_values=False).sections['1'].members
+        report = members.memory_report()
+        self.assertEqual(report['interned'], 0)
@@ -0,0 +1,82 @@
+# coding=utf-8
+import support
+
+import osm
+
+
+class PrefetcherTest(support.OSMTestCase):
+
+    def setUp(self):
+        support.OSMTestCase.setUp(self)
+        self.accessor = osm.Accessor(support.authorisor())
+
+    def prefetch(self, roles=None, **kwargs):
+        sectionids = kwargs.pop('sectionids', None)
+        prefetcher = osm.Prefetcher(**kwargs)
+        self.addCleanup(prefetcher.close)
+        prefetcher.start(self.accessor,
+                         roles if roles is not None else self.server.roles,
+                         sectionids=sectionids)
+        prefetcher.wait()
+        return prefetcher
+
+    def sections(self):
+        return [dict(osm.urlparse.parse_qsl(url.split('?', 1)[1]))
+                .get('sectionid') for url, data in self.server.calls]
+
+    def test_requests_are_taken_in_priority_order(self):
+        self.prefetch(workers=1)
+        self.assertEqual(self.server.actions(),
+                         ['getTerms'] + ['getUserDetails'] * 2 +
+                         ['getInitialBadges'] * 8)
+
+    def test_priorities_can_be_changed(self):
+        self.prefetch(workers=1, priorities={'badges': 0})
+        self.assertEqual(self.server.actions(),
+                         ['getTerms'] + ['getInitialBadges'] * 8 +
+                         ['getUserDetails'] * 2)
+
+    def test_depth_2_fetches_badge_members(self):
+        self.prefetch(depth=2)
+        actions = self.server.actions()
+        # Two badges of each of four types, in two sections.
+        self.assertEqual(actions.count('challenges.php'), 16)
+        self.assertEqual(len(actions), len(set(self.server.calls)))
+
+    def test_sectionids(self):
+        self.prefetch(sectionids=['2'])
+        self.assertEqual(set(self.sections()), set([None, '2']))
+
+    def test_sections_without_a_term_are_skipped(self):
+        roles = self.server.roles + [
+            {'sectionid': '3', 'sectionname': 'Explorers',
+             'section': 'explorers', 'isDefault': '0', 'sectionConfig': {}}]
+        self.prefetch(roles)
+        self.assertNotIn('3', self.sections())
+        self.assertEqual(self.server.actions().count('getUserDetails'), 2)
+
+    def test_close_stops_the_workers(self):
+        prefetcher = self.prefetch(workers=3)
+        threads = list(prefetcher._threads)
+        self.assertEqual(len(threads), 3)
+
+        prefetcher.close()
+        self.assertEqual(prefetcher._threads, [])
+        self.assertFalse([thread for thread in threads if thread.is_alive()])
+
+    def test_osm_is_built_from_the_prefetched_cache(self):
+        self.server.delay = 0.01
+        group = self.osm(prefetch=osm.Prefetcher(depth=2))
+        group.prefetch.wait()
+
+        # Every request was made once, by the prefetcher or the build.
+        self.assertEqual(len(self.server.calls), len(set(self.server.calls)))
+        self.assertEqual(self.server.actions().count('getUserDetails'), 2)
+        self.assertEqual(self.server.actions().count('getInitialBadges'), 8)
+
+        calls = len(self.server.calls)
+        self.assertEqual(len(group.sections['1'].challenge['b1']
+                             .get_members()), 0)
+        group = self.osm()
+        self.assertEqual(sorted(group.sections.keys()), ['1', '2'])
+        self.assertEqual(len(self.server.calls), calls)
@@ -0,0 +1,69 @@
+# coding=utf-8
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+import support
+
+import osm
+
+
+class ProfilerTest(unittest.TestCase):
+
+    def profiler(self):
+        profiler = osm.Profiler()
+        profiler.spans = [(('build',), 10.0, 11.0, 1),
+                          (('build', 'fetch'), 10.2, 10.5, 1),
+                          (('build', 'fetch'), 10.6, 10.7, 1),
+                          (('fetch',), 10.0, 10.25, 2)]
+        return profiler
+
+    def test_collapsed_stacks_hold_self_time(self):
+        self.assertEqual(self.profiler().collapsed(),
+                         {'build': 600000,
+                          'build;fetch': 400000,
+                          'fetch': 250000})
+
+    def test_chrome_trace(self):
+        events = self.profiler().chrome_trace()['traceEvents']
+        self.assertEqual(len(events), 4)
+        self.assertEqual(events[1], {'name': 'fetch', 'ph': 'X',
+                                     'ts': 10200000, 'dur': 300000,
+                                     'pid': os.getpid(), 'tid': 1})
+
+    def test_write(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        profiler = self.profiler()
+
+        profiler.write(os.path.join(directory, 'trace.json'))
+        with open(os.path.join(directory, 'trace.json')) as trace:
+            self.assertEqual(len(json.load(trace)['traceEvents']), 4)
+
+        profiler.write(os.path.join(directory, 'stacks.txt'))
+        with open(os.path.join(directory, 'stacks.txt')) as stacks:
+            self.assertEqual(stacks.read(), "build 600000\n"
+                                            "build;fetch 400000\n"
+                                            "fetch 250000\n")
+
+
+class ProfiledRunTest(support.OSMTestCase):
+
+    def test_spans_of_an_osm_build(self):
+        profiler = osm.Profiler()
+        osm.set_profiler(profiler)
+        self.addCleanup(osm.set_profiler, None)
+        self.osm()
+
+        stacks = profiler.collapsed()
+        self.assertIn('OSM._build;fetch api.php getUserRoles', stacks)
+        self.assertIn('OSM._build;Section.__init__;Members.__init__', stacks)
+        self.assertIn('OSM._build;Section.__init__;Badges.__init__', stacks)
+
+        osm.set_profiler(None)
+        spans = len(profiler.spans)
+        osm.Accessor.clear_cache()
+        self.osm()
+        self.assertEqual(len(profiler.spans), spans)
@@ -0,0 +1,83 @@
+# coding=utf-8
+import time
+
+import support
+
+import osm
+
+COLUMNS = ['firstname', 'lastname', 'Term to Scouts'.replace(' ', '')]
+
+
+class ProjectionTest(support.OSMTestCase):
+
+    def test_only_projected_columns_are_kept(self):
+        member = self.osm(member_columns=COLUMNS).sections['1'].members['100']
+        self.assertEqual(sorted(member._record.keys()),
+                         ['custom1', 'firstname', 'lastname', 'scoutid'])
+        self.assertEqual(member['TermtoScouts'], 'x0')
+
+    def test_projection_is_cached(self):
+        self.osm(member_columns=COLUMNS)
+        fetched = self.server.actions().count('getUserDetails')
+        self.assertEqual(fetched, 2)
+
+        group = self.osm(member_columns=COLUMNS)
+        self.assertEqual(self.server.actions().count('getUserDetails'), 2)
+        self.assertEqual(group.sections['2'].members['201']['firstname'],
+                         'Kid1')
+
+    def test_full_response_is_not_kept(self):
+        self.osm(member_columns=COLUMNS)
+        cached = osm.Accessor.cache_keys().values()
+        self.assertFalse([c for c in cached
+                          if 'getUserDetails' in c and '#' not in c])
+
+    def test_refresh_fetches_again(self):
+        group = self.osm(member_columns=COLUMNS)
+        self.server.members['1'][0]['firstname'] = 'Renamed'
+        group.sections['1'].refresh(badges=False)
+        self.assertEqual(group.sections['1'].members['100']['firstname'],
+                         'Renamed')
+
+    def test_stale_projection_is_served_while_refreshed(self):
+        osm.Accessor.FRESH_TTL = 0.05
+        osm.Accessor.STALE_WHILE_REVALIDATE = True
+        section = self.osm(member_columns=COLUMNS).sections['1']
+        fetched = self.server.actions().count('getUserDetails')
+        self.server.members['1'][0]['firstname'] = 'Renamed'
+        time.sleep(0.06)
+
+        self.server.delay = 0.5
+        start = time.time()
+        members = section.get_members(COLUMNS)
+        self.assertLess(time.time() - start, 0.4)
+        self.assertEqual(members['100']['firstname'], 'Kid0')
+        self.assertEqual(osm.Accessor.metrics['stale_served'], 1)
+
+        deadline = time.time() + 5
+        while not osm.Accessor.metrics['revalidated'] and \
+                time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.server.actions().count('getUserDetails'),
+                         fetched + 1)
+        self.server.delay = 0
+        self.assertEqual(section.get_members(COLUMNS)['100']['firstname'],
+                         'Renamed')
+        self.assertEqual(self.server.actions().count('getUserDetails'),
+                         fetched + 1)
+
+    def test_expired_projection_is_fetched(self):
+        osm.Accessor.FRESH_TTL = 0.01
+        osm.Accessor.STALE_WHILE_REVALIDATE = True
+        osm.Accessor.MAX_STALE = 0.05
+        section = self.osm(member_columns=COLUMNS).sections['1']
+        fetched = self.server.actions().count('getUserDetails')
+        self.server.members['1'][0]['firstname'] = 'Renamed'
+        time.sleep(0.06)
+
+        members = section.get_members(COLUMNS)
+        self.assertEqual(members['100']['firstname'], 'Renamed')
+        self.assertEqual(osm.Accessor.metrics['expired'], 1)
+        self.assertEqual(osm.Accessor.metrics['stale_served'], 0)
+        self.assertEqual(self.server.actions().count('getUserDetails'),
+                         fetched + 1)
@@ -0,0 +1,64 @@
+# coding=utf-8
+import time
+
+import support
+
+import osm
+
+
+class RefreshSchedulerTest(support.OSMTestCase):
+
+    def test_scheduled_refreshes_run(self):
+        group = self.osm()
+        members = group.sections['1'].members
+        scheduler = group.schedule_refresh('1', 'members', 0.05, jitter=0)
+
+        deadline = time.time() + 5
+        while scheduler.status[('1', 'members')]['runs'] < 2 and \
+                time.time() < deadline:
+            time.sleep(0.01)
+
+        status = scheduler.status[('1', 'members')]
+        self.assertGreaterEqual(status['runs'], 2)
+        self.assertIsNone(status['error'])
+        self.assertIsNot(group.sections['1'].members, members)
+        self.assertLess(scheduler.lag()[('1', 'members')], 5)
+
+    def test_unknown_endpoint(self):
+        group = self.osm()
+        self.assertRaises(ValueError, group.schedule_refresh, '1', 'events', 1)
+
+    def test_failed_refresh_is_recorded_and_retried(self):
+        group = self.osm()
+        self.server.failures[('getUserDetails', '1')] = {'error': 'Down'}
+        scheduler = group.schedule_refresh('1', 'members', 0.05, jitter=0)
+
+        deadline = time.time() + 5
+        while scheduler.status[('1', 'members')]['runs'] < 2 and \
+                time.time() < deadline:
+            time.sleep(0.01)
+
+        status = scheduler.status[('1', 'members')]
+        self.assertGreaterEqual(status['runs'], 2)
+        self.assertIsInstance(status['error'], osm.OSMException)
+        self.assertIsNone(status['last'])
+        self.assertIsNone(scheduler.lag()[('1', 'members')])
+
+    def test_budget_holds_jobs_back(self):
+        scheduler = osm.RefreshScheduler(self.osm(), budget=6)
+        self.addCleanup(scheduler.close)
+
+        # Six requests a minute, all available at first.
+        self.assertEqual(scheduler._take_budget(4), 0)
+        self.assertAlmostEqual(scheduler._take_budget(4), 20, delta=0.1)
+
+        unlimited = osm.RefreshScheduler(self.osm())
+        self.addCleanup(unlimited.close)
+        self.assertEqual(unlimited._take_budget(99), 0)
+
+    def test_jitter(self):
+        scheduler = osm.RefreshScheduler(self.osm())
+        self.addCleanup(scheduler.close)
+        delays = [scheduler._next(10, 0.2) for i in range(200)]
+        self.assertTrue(8 <= min(delays) and max(delays) <= 12)
+        self.assertGreater(max(delays) - min(delays), 1)
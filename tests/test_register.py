@@ -0,0 +1,68 @@
+# coding=utf-8
+import datetime
+
+import support
+
+
+def row(scoutid, **marks):
+    ret = {'scoutid': scoutid, 'firstname': 'Kid', 'lastname': 'Jones'}
+    for day, value in marks.items():
+        ret['2026-02-%02d' % int(day[1:])] = value
+    return ret
+
+
+def day(n):
+    return datetime.datetime(2026, 2, n)
+
+
+class RegisterTest(support.OSMTestCase):
+
+    def setUp(self):
+        support.OSMTestCase.setUp(self)
+        self.server.register['2'] = [
+            row('200', d01='Yes', d02='No', d08=''),
+            row('201', d01='Yes', d02='Yes', d08='')]
+        self.section = self.osm().sections['2']
+        self.register = self.section.register()
+
+    def set_rows(self, *rows):
+        self.server.register['2'] = list(rows)
+
+    def test_marks(self):
+        self.assertEqual(self.register.meetings, [day(1), day(2), day(8)])
+        self.assertTrue(self.register['200', day(1)])
+        self.assertFalse(self.register['200', day(2)])
+        self.assertIsNone(self.register['200', day(8)])
+
+    def test_unknown_date_is_key_error(self):
+        self.assertRaises(KeyError, lambda: self.register['200', day(3)])
+        self.assertRaises(KeyError, lambda: self.register['999', day(1)])
+
+    def test_rates_and_streaks(self):
+        self.assertEqual(self.register.rate('200'), 0.5)
+        self.assertEqual(self.register.rate('201'), 1.0)
+        self.assertEqual(self.register.longest_streak('201'), 2)
+        self.assertEqual(self.register.above(0.75), ['201'])
+        self.assertEqual(self.register.meeting_totals(),
+                         [(day(1), 2), (day(2), 1), (day(8), 0)])
+
+    def test_register_is_kept_per_term(self):
+        self.assertIs(self.section.register(), self.register)
+
+    def test_refresh_adds_new_meetings(self):
+        self.set_rows(row('200', d01='Yes', d02='No', d08='', d15='Yes'),
+                      row('201', d01='Yes', d02='Yes', d08='', d15='No'))
+
+        self.assertEqual(self.register.refresh(), [day(15)])
+        self.assertTrue(self.register['200', day(15)])
+        self.assertFalse(self.register['201', day(15)])
+        self.assertTrue(self.register['200', day(1)])
+
+    def test_refresh_picks_up_late_marks(self):
+        self.set_rows(row('200', d01='Yes', d02='No', d08='Yes'),
+                      row('201', d01='Yes', d02='Yes', d08='No'))
+
+        self.assertEqual(self.register.refresh(), [day(8)])
+        self.assertTrue(self.register['200', day(8)])
+        self.assertFalse(self.register['201', day(8)])
+        self.assertEqual(self.register.refresh(), [])
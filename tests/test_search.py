@@ -0,0 +1,83 @@
+# coding=utf-8
+import threading
+
+import support
+
+from search import MemberSearch, trigrams
+
+
+class MemberSearchTest(support.OSMTestCase):
+
+    def setUp(self):
+        support.OSMTestCase.setUp(self)
+        self.group = self.osm()
+        self.search = MemberSearch(self.group, contact=True)
+
+    def test_trigrams_ignore_case_and_phone_spacing(self):
+        self.assertEqual(trigrams('ABC'), trigrams('abc'))
+        self.assertEqual(trigrams('0123 456'), trigrams('0123456'))
+
+    def test_misspelt_name_matches(self):
+        results = self.search('kid3 smtih')
+        self.assertEqual(results[0][0]['firstname'], 'Kid3')
+
+    def test_pruned_search_ranks_like_a_full_scan(self):
+        names = ['Olivia', 'Oliver', 'Olive', 'Liv', 'Livia', 'Ollie',
+                 'Olivier', 'Violet', 'Viola', 'Sylvia']
+        self.server.members['1'] = [
+            dict(record, firstname=names[i % len(names)],
+                 lastname='Smith%d' % (i % 7))
+            for i, record in enumerate(support.member_records('1', 120))]
+        self.group.sections['1'].refresh(badges=False)
+
+        for query in ('olivia', 'olvia smith3', 'violette', 'smth'):
+            grams = trigrams(query)
+            expected = []
+            members = [member for section in self.group.sections.values()
+                       for member in section.members.values()]
+            for member in members:
+                doc_grams = trigrams(self.search._text(member))
+                common = len(grams & doc_grams)
+                if common >= 0.25 * len(grams):
+                    expected.append(
+                        (float(common) / len(grams),
+                         2.0 * common / (len(grams) + len(doc_grams))))
+            expected = sorted(expected, reverse=True)[:10]
+
+            results = self.search(query)
+            self.assertEqual(
+                [(score, 2.0 * score * len(grams) /
+                  (len(grams) + len(trigrams(self.search._text(member)))))
+                 for member, score in results], expected)
+
+    def test_follows_member_edits(self):
+        member = self.group.sections['1'].members['100']
+        member['firstname'] = 'Zebedee'
+        self.assertEqual(self.search('zebedee')[0][0]['scoutid'], '100')
+
+    def test_queries_during_refresh(self):
+        section = self.group.sections['1']
+        errors = []
+        done = threading.Event()
+
+        def query():
+            while not done.is_set():
+                try:
+                    self.search('kid jones')
+                except Exception as e:
+                    errors.append(e)
+                    return
+
+        threads = [threading.Thread(target=query) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        try:
+            for i in range(20):
+                section.refresh(badges=False)
+        finally:
+            done.set()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(self.search), 10)
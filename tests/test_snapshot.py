@@ -0,0 +1,76 @@
+# coding=utf-8
+import os
+import shutil
+import tempfile
+
+import support
+
+from snapshot import MemberSnapshot, export_members
+
+
+class SnapshotTest(support.OSMTestCase):
+
+    def setUp(self):
+        support.OSMTestCase.setUp(self)
+        self.server.members['1'][0]['yrs'] = 10
+        self.server.members['1'][0]['notes'] = u'Caf\xe9'
+        self.server.members['1'][1]['yrs'] = 9
+        self.section = self.osm().sections['1']
+
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        self.path = os.path.join(tmp, 'cubs.snap')
+
+    def test_round_trip(self):
+        export_members(self.section, self.path)
+        with MemberSnapshot(self.path) as snapshot:
+            self.assertEqual(sorted(snapshot.keys()),
+                             sorted(self.section.members.keys()))
+            for scoutid, member in self.section.members.items():
+                row = dict(snapshot[scoutid])
+                # Columns other members have are None where missing.
+                self.assertEqual(dict([(k, v) for k, v in row.items()
+                                       if k in member._record]),
+                                 member._record)
+                self.assertEqual([v for k, v in row.items()
+                                  if k not in member._record],
+                                 [None] * (len(row) - len(member._record)))
+
+    def test_values_keep_their_types(self):
+        export_members(self.section.members, self.path)
+        with MemberSnapshot(self.path) as snapshot:
+            self.assertEqual(snapshot['100']['notes'], u'Caf\xe9')
+            self.assertEqual(snapshot['100']['yrs'], 10)
+            self.assertIsNone(snapshot['102']['yrs'])
+            self.assertEqual(snapshot['100']['TermtoScouts'], 'x0')
+
+    def test_unknown_member(self):
+        export_members(self.section, self.path)
+        with MemberSnapshot(self.path) as snapshot:
+            self.assertNotIn('999', snapshot)
+            self.assertRaises(KeyError, lambda: snapshot['999'])
+
+    def test_mixed_values_are_kept_as_json(self):
+        self.section.members['100']['custom2'] = {'allergies': ['nuts']}
+        self.section.members['101']['custom2'] = 'none'
+        export_members(self.section, self.path)
+        with MemberSnapshot(self.path) as snapshot:
+            self.assertEqual(snapshot['100']['custom2'],
+                             {'allergies': ['nuts']})
+            self.assertEqual(snapshot['101'].custom2, 'none')
+            self.assertEqual(len(snapshot), 5)
+
+    def test_readers_keep_their_snapshot_when_it_is_replaced(self):
+        export_members(self.section, self.path)
+        with MemberSnapshot(self.path) as old:
+            self.section.members['100']['firstname'] = 'Renamed'
+            export_members(self.section, self.path)
+            self.assertEqual(old['100']['firstname'], 'Kid0')
+            with MemberSnapshot(self.path) as new:
+                self.assertEqual(new['100']['firstname'], 'Renamed')
+        self.assertFalse(os.path.exists(self.path + '.tmp'))
+
+    def test_other_files_are_rejected(self):
+        with open(self.path, 'wb') as out:
+            out.write('not a snapshot' * 4)
+        self.assertRaises(ValueError, MemberSnapshot, self.path)
@@ -0,0 +1,81 @@
+# coding=utf-8
+import time
+
+import support
+
+import osm
+
+TERMS = 'api.php?action=getTerms'
+
+
+class StaleWhileRevalidateTest(support.OSMTestCase):
+
+    def setUp(self):
+        support.OSMTestCase.setUp(self)
+        self.accessor = osm.Accessor(support.authorisor())
+        osm.Accessor.FRESH_TTL = 0.05
+        osm.Accessor.STALE_WHILE_REVALIDATE = True
+        self.accessor(TERMS)
+        self.server.terms['2'][0]['name'] = 'Renamed'
+
+    def wait_for(self, metric):
+        deadline = time.time() + 5
+        while not osm.Accessor.metrics[metric] and time.time() < deadline:
+            time.sleep(0.01)
+
+    def test_fresh_responses_are_served(self):
+        self.assertEqual(self.accessor(TERMS)['2'][0]['name'], 'Year')
+        self.assertEqual(self.server.actions(), ['getTerms'])
+        self.assertEqual(osm.Accessor.metrics['stale_served'], 0)
+
+    def test_stale_response_is_served_and_refreshed(self):
+        time.sleep(0.06)
+        self.server.delay = 0.5
+
+        start = time.time()
+        self.assertEqual(self.accessor(TERMS)['2'][0]['name'], 'Year')
+        self.assertLess(time.time() - start, 0.4)
+        self.assertEqual(osm.Accessor.metrics['stale_served'], 1)
+
+        self.wait_for('revalidated')
+        self.assertEqual(osm.Accessor.metrics['revalidated'], 1)
+        self.assertEqual(self.server.actions(), ['getTerms', 'getTerms'])
+        self.server.delay = 0
+        self.assertEqual(self.accessor(TERMS)['2'][0]['name'], 'Renamed')
+        self.assertEqual(len(self.server.calls), 2)
+
+    def test_one_refresh_for_concurrent_stale_hits(self):
+        time.sleep(0.06)
+        self.server.delay = 0.2
+        for i in range(5):
+            self.accessor(TERMS)
+
+        self.assertEqual(osm.Accessor.metrics['stale_served'], 5)
+        self.wait_for('revalidated')
+        self.assertEqual(self.server.actions(), ['getTerms', 'getTerms'])
+
+    def test_failed_refresh_keeps_the_stale_response(self):
+        time.sleep(0.06)
+        self.server.failures['getTerms'] = {'error': 'Down'}
+        self.assertEqual(self.accessor(TERMS)['2'][0]['name'], 'Year')
+
+        self.wait_for('revalidate_failed')
+        self.assertEqual(osm.Accessor.metrics['revalidate_failed'], 1)
+        self.assertEqual(self.accessor(TERMS)['2'][0]['name'], 'Year')
+
+    def test_responses_older_than_max_stale_are_fetched(self):
+        osm.Accessor.MAX_STALE = 0.1
+        time.sleep(0.11)
+
+        self.assertEqual(self.accessor(TERMS)['2'][0]['name'], 'Renamed')
+        self.assertEqual(osm.Accessor.metrics['expired'], 1)
+        self.assertEqual(osm.Accessor.metrics['stale_served'], 0)
+        self.assertEqual(self.server.actions(), ['getTerms', 'getTerms'])
+
+    def test_without_stale_while_revalidate_expired_is_fetched(self):
+        osm.Accessor.STALE_WHILE_REVALIDATE = False
+        time.sleep(0.06)
+
+        self.assertEqual(self.accessor(TERMS)['2'][0]['name'], 'Renamed')
+        self.assertEqual(osm.Accessor.metrics['expired'], 1)
+        self.assertEqual(osm.Accessor.metrics['stale_served'], 0)
@@ -0,0 +1,69 @@
+# coding=utf-8
+import time
+import multiprocessing
+
+import support
+
+import sync
+
+
+def _reserve(throttle, slots):
+    slots.put(throttle._reserve(time.time()))
+
+
+class SyncTest(support.OSMTestCase):
+
+    def test_sections_are_synced_in_a_pool(self):
+        results = sync.Sync([support.authorisor()], processes=2,
+                            rate=100).run()
+
+        self.assertEqual(sorted(results.keys()), [('u1', '1'), ('u1', '2')])
+        data = results[('u1', '2')]
+        self.assertEqual(data['section']['sectionname'], 'Scouts')
+        self.assertEqual(data['term']['termid'], '20')
+        self.assertEqual(sorted([m['scoutid'] for m in data['members']]),
+                         ['200', '201', '202', '203', '204'])
+        self.assertEqual(sorted([b['name']
+                                 for b in data['badges']['challenge']]),
+                         ['Artist', 'Cook'])
+
+    def test_sectionids(self):
+        results = sync.Sync([support.authorisor()], sectionids=['2'],
+                            processes=2, rate=100).run()
+        self.assertEqual(results.keys(), [('u1', '2')])
+
+    def test_failed_units_are_recorded(self):
+        self.server.failures[('getUserDetails', '1')] = {'error': 'Denied'}
+        runner = sync.Sync([support.authorisor()], processes=2, rate=100)
+        results = runner.run()
+
+        self.assertEqual(results.keys(), [('u1', '2')])
+        self.assertEqual(runner.errors.keys(), [('u1', '1')])
+        self.assertIn('Denied', runner.errors[('u1', '1')])
+        self.assertNotIn("'s1'", runner.errors[('u1', '1')])
+
+    def test_failed_accounts_are_recorded(self):
+        self.server.failures['getUserRoles'] = {'error': 'Bad secret'}
+        runner = sync.Sync([support.authorisor()], processes=1, rate=100)
+        self.assertEqual(runner.run(), {})
+        self.assertIn('Bad secret', runner.errors[('u1', None)])
+
+
+class SharedThrottleTest(support.OSMTestCase):
+
+    def test_slots_are_shared_between_processes(self):
+        throttle = sync.SharedThrottle(rate=1)
+        slots = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=_reserve,
+                                             args=(throttle, slots))
+                     for i in range(3)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        _reserve(throttle, slots)
+
+        slots = sorted([slots.get(timeout=5) for i in range(4)])
+        gaps = [b - a for a, b in zip(slots, slots[1:])]
+        for gap in gaps:
+            self.assertAlmostEqual(gap, 1.0, places=3)
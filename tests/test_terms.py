@@ -0,0 +1,89 @@
+# coding=utf-8
+import datetime
+import unittest
+
+import support
+
+import osm
+
+
+def term(termid, start, end):
+    return {'sectionid': '1', 'termid': termid, 'name': 'Term' + termid,
+            'startdate': start, 'enddate': end}
+
+
+def day(month, date):
+    return datetime.datetime(2026, month, date)
+
+
+class TermIndexTest(unittest.TestCase):
+
+    def index(self, policy=osm.TermIndex.LATEST):
+        return osm.TermIndex(None, None, {'1': [
+            term('3', '2026-09-01', '2026-12-20'),
+            term('1', '2026-01-01', '2026-04-01'),
+            term('2', '2026-04-10', '2026-07-20'),
+            term('4', '2026-10-01', '2026-12-31')]}, policy)
+
+    def termids(self, terms):
+        return [t['termid'] for t in terms]
+
+    def test_terms_are_ordered_by_start(self):
+        self.assertEqual(self.termids(self.index().terms('1')),
+                         ['1', '2', '3', '4'])
+        self.assertEqual(self.index().terms('99'), [])
+
+    def test_active(self):
+        index = self.index()
+        self.assertEqual(self.termids(index.active('1', day(2, 1))), ['1'])
+        self.assertEqual(index.active('1', day(4, 5)), [])
+        self.assertEqual(self.termids(index.active('1', day(11, 1))),
+                         ['3', '4'])
+        self.assertEqual(self.termids(index.active('1', day(12, 25))), ['4'])
+
+    def test_overlap_policies(self):
+        self.assertEqual(self.index().current('1', day(11, 1))['termid'],
+                         '4')
+        self.assertEqual(
+            self.index(osm.TermIndex.EARLIEST).current('1', day(11, 1))
+            ['termid'], '3')
+        self.assertRaises(osm.TermError,
+                          self.index(osm.TermIndex.STRICT).current,
+                          '1', day(11, 1))
+
+    def test_no_active_term(self):
+        self.assertRaises(osm.TermError, self.index().current, '1',
+                          day(4, 5))
+
+    def test_long_term_behind_short_ones(self):
+        index = osm.TermIndex(None, None, {'1': [
+            term('1', '2026-01-01', '2026-12-31'),
+            term('2', '2026-02-01', '2026-02-10'),
+            term('3', '2026-03-01', '2026-03-10')]})
+        self.assertEqual(self.termids(index.active('1', day(6, 1))), ['1'])
+
+
+class OSMTermsTest(support.OSMTestCase):
+
+    def test_terms_are_fetched_once_for_every_section(self):
+        group = self.osm()
+        self.assertEqual(self.server.actions().count('getTerms'), 1)
+        self.assertEqual(group.sections['1'].term['termid'], '10')
+        self.assertEqual(group.sections['2'].term['termid'], '20')
+        self.assertEqual([t['termid'] for t in group.terms('1')],
+                         ['11', '10'])
+
+    def test_sections_without_a_term_are_an_error(self):
+        self.server.terms['2'] = []
+        self.assertRaises(osm.TermError, self.osm)
+
+    def test_term_policy_is_used_for_overlapping_terms(self):
+        self.server.terms['1'].append(self.server.term(
+            '1', '12', 'Extra', '2026-09-15', '2026-12-19'))
+        self.assertRaises(osm.TermError, self.osm,
+                          term_policy=osm.TermIndex.STRICT)
+
+        group = self.osm(term_policy=osm.TermIndex.EARLIEST)
+        self.assertEqual(group.sections['1'].term['termid'], '10')
+        self.assertEqual([t['termid'] for t in group.sections['1'].terms],
+                         ['10', '12'])
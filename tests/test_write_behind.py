@@ -0,0 +1,96 @@
+# coding=utf-8
+import support
+
+import osm
+
+
+class WriteBehindTest(support.OSMTestCase):
+
+    def setUp(self):
+        support.OSMTestCase.setUp(self)
+        self.group = self.osm()
+        self.queue = self.group.enable_write_behind(interval=60)
+        self.members = self.group.sections['1'].members
+
+    def updates(self):
+        return [data for url, data in self.server.calls
+                if 'updateMember' in url]
+
+    def test_repeated_saves_are_merged(self):
+        member = self.members['100']
+        member['firstname'] = 'A'
+        first = member.save()
+        member['firstname'] = 'B'
+        member['lastname'] = 'C'
+        second = member.save()
+
+        self.assertIs(first, second)
+        self.assertEqual(self.updates(), [])
+
+        self.queue.flush()
+        self.assertTrue(first.result(1))
+        updates = self.updates()
+        self.assertEqual(len(updates), 2)
+        self.assertTrue([u for u in updates if 'value=B' in u])
+
+    def test_edit_put_back_while_queued_is_not_sent(self):
+        member = self.members['100']
+        member['firstname'] = 'A'
+        pending = member.save()
+        member['firstname'] = 'Kid0'
+        member.save()
+
+        self.queue.flush()
+        self.assertTrue(pending.result(1))
+        self.assertEqual(self.updates(), [])
+
+    def test_close_flushes(self):
+        member = self.members['101']
+        member['firstname'] = 'A'
+        pending = member.save()
+        done = []
+        pending.add_done_callback(done.append)
+
+        self.group.close()
+        self.assertTrue(pending.done())
+        self.assertEqual(done, [pending])
+        self.assertEqual(len(self.updates()), 1)
+
+    def test_failed_write_keeps_the_edits(self):
+        self.server.failures['updateMember'] = {'error': 'Not allowed'}
+        member = self.members['100']
+        member['firstname'] = 'A'
+        pending = member.save()
+        self.assertEqual(member.changes(), {})
+
+        self.queue.flush()
+        self.assertIsInstance(pending.exception(1), osm.OSMException)
+        self.assertEqual(member.changes()['firstname'],
+                         osm.FieldChange('firstname', 'Kid0', 'A'))
+
+        del self.server.failures['updateMember']
+        pending = member.save()
+        self.queue.flush()
+        self.assertTrue(pending.result(1))
+        self.assertEqual(member.changes(), {})
+        self.assertEqual(len(self.updates()), 2)
+
+    def test_max_pending_wakes_the_writer(self):
+        self.queue.max_pending = 2
+        first = self.members['100']
+        first['firstname'] = 'A'
+        first.save()
+        second = self.members['101']
+        second['firstname'] = 'B'
+        pending = second.save()
+
+        # Well before the 60 second interval.
+        self.assertTrue(pending.result(5))
+        self.assertEqual(len(self.updates()), 2)
+
+    def test_saves_after_close_are_refused(self):
+        self.queue.close()
+        member = self.members['100']
+        member['firstname'] = 'A'
+        self.assertRaises(RuntimeError, member.save)
+        self.assertEqual(member.changes().keys(), ['firstname'])